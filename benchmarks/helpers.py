@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Measure the throughput of ``drip.helpers.parse``.
+
+Parses a mix of the interval strings queryset rules use, first with
+the memo cleared before every round, which is what every new string
+costs, then with the memo warm, which is what a rule evaluated again
+on each ``walk()`` shift costs. Run it from the repository root:
+
+    python benchmarks/helpers.py --number 100000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+INTERVALS = (
+    '7 days',
+    '1 week, 2 days',
+    '3 hours 30 minutes',
+    '1.5 weeks',
+    '2 days, 03:04:05',
+    '-1:30:00',
+)
+
+
+def benchmark(label, statement, number, repeat):
+    best = min(timeit.repeat(statement, number=number, repeat=repeat))
+    print(
+        '{label}: {rate:,.0f} parses per second, best of {repeat}'.format(
+            label=label,
+            rate=number * len(INTERVALS) / best,
+            repeat=repeat,
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--number', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(
+        0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    from drip.helpers import parse
+
+    def cold():
+        for interval in INTERVALS:
+            parse.cache_clear()
+            parse(interval)
+
+    def warm():
+        for interval in INTERVALS:
+            parse(interval)
+
+    benchmark('cold', cold, args.number, args.repeat)
+    benchmark('warm', warm, args.number, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
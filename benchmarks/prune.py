@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Compare the ``in`` and ``exists`` strategies of ``DripBase.prune``.
+
+Seeds a throwaway test database with users and SentDrips, prints the
+query plan of each strategy and times how long counting the pruned
+audience takes. Run it from the repository root:
+
+    python benchmarks/prune.py --users 20000 --sent 15000
+
+Point ``DJANGO_SETTINGS_MODULE`` at settings for Postgres or MySQL to
+benchmark those backends, the default uses ``testsettings``.
+"""
+import argparse
+import os
+import sys
+import time
+
+
+def setup_django():
+    sys.path.insert(
+        0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'testsettings')
+
+    import django
+    django.setup()
+
+
+def seed(users, sent, batch_size=1000):
+    from drip.models import Drip, QuerySetRule, SentDrip
+    from drip.utils import get_user_model
+
+    User = get_user_model()
+    User.objects.bulk_create(
+        [
+            User(username='user_{i}'.format(i=i), email='{i}@example.com')
+            for i in range(users)
+        ],
+        batch_size=batch_size,
+    )
+    model_drip = Drip.objects.create(
+        name='Prune benchmark',
+        subject_template='Hello',
+        body_html_template='Hello {{ user.username }}',
+    )
+    QuerySetRule.objects.create(
+        drip=model_drip,
+        field_name='date_joined',
+        lookup_type='lte',
+        field_value='now+1 days',
+    )
+    SentDrip.objects.bulk_create(
+        [
+            SentDrip(drip=model_drip, user_id=user_id, subject='', body='')
+            for user_id in User.objects.values_list(
+                'id', flat=True,
+            )[:sent]
+        ],
+        batch_size=batch_size,
+    )
+    return model_drip
+
+
+def benchmark(model_drip, strategy, repeat):
+    from django.test import override_settings
+
+    with override_settings(DRIP_PRUNE_STRATEGY=strategy):
+        drip = model_drip.drip
+        drip.prune()
+        queryset = drip.get_queryset()
+        print('--- {strategy} ---'.format(strategy=strategy))
+        print(queryset.explain())
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = queryset.count()
+            timings.append(time.perf_counter() - start)
+    print(
+        '{strategy}: {count} users left, best of {repeat}: '
+        '{best:.4f}s\n'.format(
+            strategy=strategy,
+            count=count,
+            repeat=repeat,
+            best=min(timings),
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--sent', type=int, default=15000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        model_drip = seed(args.users, args.sent)
+        for strategy in ('in', 'exists'):
+            benchmark(model_drip, strategy, args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,23 @@
-import json
-
 from django import forms
+from django.conf import settings
 from django.contrib import admin
 from django.shortcuts import render, get_object_or_404
 from django.http import HttpResponse
-from django.urls import path
+from django.urls import path, reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 
-from drip.models import Drip, SentDrip, QuerySetRule
+from drip.models import Drip, DripRun, SentDrip, QuerySetRule
 from drip.drips import configured_message_classes, message_class_for
-from drip.utils import get_user_model, get_simple_fields
+from drip.utils import get_user_model, get_field_graph
+
+
+def timeline_page_size() -> int:
+    """Number of users listed per day on each page of a drip timeline.
+
+    :return: the ``DRIP_TIMELINE_PAGE_SIZE`` setting, defaults to 100
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_TIMELINE_PAGE_SIZE', 100)
 
 
 class QuerySetRuleInline(admin.TabularInline):
@@ -34,7 +43,6 @@ class DripAdmin(admin.ModelAdmin):
         QuerySetRuleInline,
     ]
     form = DripForm
-    users_fields = []
 
     def av(self, view):
         return self.admin_site.admin_view(view)
@@ -42,27 +50,49 @@ class DripAdmin(admin.ModelAdmin):
     def timeline(self, request, drip_id, into_past, into_future):
         """
         Return a list of people who should get emails.
+
+        Users are listed on the first day they would get the drip,
+        ``timeline_page_size()`` per day and page.
         """
 
-        drip = get_object_or_404(Drip, id=drip_id)
+        drip = get_object_or_404(
+            Drip.objects.prefetch_related('queryset_rules'), id=drip_id,
+        )
 
-        shifted_drips = []
-        seen_users = set()
-        for shifted_drip in drip.drip.walk(
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        page_size = timeline_page_size()
+        start = (page - 1) * page_size
+
+        drip_base = drip.drip
+        walked_drips = drip_base.walk(
             into_past=int(into_past), into_future=int(into_future)+1
+        )
+        counts = drip_base.count_first_days(walked_drips)
+        users = drip_base.get_first_day_users(walked_drips)
+
+        shifted_drips = []
+        for day, (shifted_drip, count) in enumerate(
+            zip(walked_drips, counts)
         ):
-            shifted_drip.prune()
+            page_users = []
+            if count > start:
+                # only the users of the page are fetched
+                page_users = list(
+                    users.filter(drip_first_day=day)[start:start + page_size]
+                )
             shifted_drips.append(
                 {
                     'drip': shifted_drip,
-                    'qs': shifted_drip.get_queryset().exclude(
-                        id__in=seen_users,
-                    ),
+                    'qs': page_users,
+                    'count': count,
                 },
             )
-            seen_users.update(
-                shifted_drip.get_queryset().values_list('id', flat=True)
-            )
+        has_next_page = any(count > start + page_size for count in counts)
+        next_page = page + 1
+        previous_page = page - 1
 
         return render(request, 'drip/timeline.html', locals())
 
@@ -99,12 +129,27 @@ class DripAdmin(admin.ModelAdmin):
 
         return HttpResponse(html, content_type=mime)
 
+    def field_data(self, request):
+        """
+        Return the simple fields of the user model as JSON.
+
+        The rule form fetches them when a field name is first edited.
+        Browsers keep the response and revalidate it with its ETag, so
+        unchanged fields are answered with a 304.
+        """
+        content, etag = get_field_graph(get_user_model()).field_data
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def build_extra_context(self, extra_context):
         extra_context = extra_context or {}
-        User = get_user_model()
-        if not self.users_fields:
-            self.users_fields = json.dumps(get_simple_fields(User))
-        extra_context['field_data'] = self.users_fields
+        extra_context['field_data_url'] = reverse(
+            'admin:drip_field_data', current_app=self.admin_site.name,
+        )
         return extra_context
 
     def add_view(self, request, extra_context=None):
@@ -122,6 +167,11 @@ class DripAdmin(admin.ModelAdmin):
     def get_urls(self):
         urls = super(DripAdmin, self).get_urls()
         my_urls = [
+            path(
+                'field_data/',
+                self.av(self.field_data),
+                name='drip_field_data'
+            ),
             path(
                 '<int:drip_id>/timeline/<int:into_past>/<int:into_future>/',
                 self.av(self.timeline),
@@ -159,3 +209,24 @@ class SentDripAdmin(admin.ModelAdmin):
 
 
 admin.site.register(SentDrip, SentDripAdmin)
+
+
+class DripRunAdmin(admin.ModelAdmin):
+    list_display = [
+        'drip', 'started_at', 'duration', 'audience', 'pruned', 'sent',
+        'failures', 'query_time', 'prune_time', 'render_time',
+        'send_time', 'persist_time',
+    ]
+    list_filter = ['drip']
+    list_select_related = ['drip']
+    date_hierarchy = 'started_at'
+    ordering = ['-started_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(DripRun, DripRunAdmin)
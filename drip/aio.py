@@ -0,0 +1,363 @@
+import asyncio
+import logging
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage
+from django.core.mail.message import sanitize_address
+
+from drip.drips import SentDripWriter, send_chunk_size
+from drip.tracing import span
+
+#: the async backend used in place of each Django email backend
+ASYNC_EMAIL_BACKENDS = {
+    'django.core.mail.backends.locmem.EmailBackend':
+        'drip.aio.LocmemAsyncEmailBackend',
+    'django.core.mail.backends.smtp.EmailBackend':
+        'drip.aio.SMTPAsyncEmailBackend',
+}
+
+
+def async_email_backend() -> str:
+    """Dotted path of the async email backend sending drips.
+
+    :return: the ``DRIP_ASYNC_EMAIL_BACKEND`` setting, defaults to the
+        async counterpart of ``EMAIL_BACKEND``
+    :rtype: str
+    """
+    path = getattr(settings, 'DRIP_ASYNC_EMAIL_BACKEND', None)
+    if path:
+        return path
+    try:
+        return ASYNC_EMAIL_BACKENDS[settings.EMAIL_BACKEND]
+    except KeyError:
+        raise ImproperlyConfigured(
+            'No async email backend for {backend}, set '
+            'DRIP_ASYNC_EMAIL_BACKEND.'.format(
+                backend=settings.EMAIL_BACKEND,
+            )
+        )
+
+
+def async_concurrency() -> int:
+    """Number of messages being sent at once by an async drip run.
+
+    :return: the ``DRIP_ASYNC_CONCURRENCY`` setting, defaults to 100
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_ASYNC_CONCURRENCY', 100)
+
+
+def get_async_connection(path: str = None, **kwargs):
+    mod_name, klass_name = (path or async_email_backend()).rsplit('.', 1)
+    klass = getattr(import_module(mod_name), klass_name)
+    return klass(**kwargs)
+
+
+class AsyncEmailBackend(object):
+    """
+    The protocol of async email backends.
+
+    Like Django's email backends, but ``open``, ``close`` and
+    ``send_messages`` are coroutines. A connection sends one message
+    at a time, concurrency comes from using several connections.
+    """
+
+    def __init__(self, fail_silently: bool = False, **kwargs):
+        self.fail_silently = fail_silently
+
+    async def open(self) -> bool:
+        """Open the connection, returns whether a new one was opened."""
+        return False
+
+    async def close(self) -> None:
+        pass
+
+    async def send_messages(self, email_messages: list) -> int:
+        """Send the EmailMessages, returns the count of messages sent."""
+        raise NotImplementedError
+
+    async def __aenter__(self):
+        try:
+            await self.open()
+        except Exception:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class LocmemAsyncEmailBackend(AsyncEmailBackend):
+    """
+    Keeps the messages in ``django.core.mail.outbox``, like Django's
+    locmem backend, for tests.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(LocmemAsyncEmailBackend, self).__init__(*args, **kwargs)
+        if not hasattr(mail, 'outbox'):
+            mail.outbox = []
+
+    async def send_messages(self, email_messages: list) -> int:
+        # let other messages go on, as a network backend would
+        await asyncio.sleep(0)
+        count = 0
+        for email_message in email_messages:
+            # make sure the message can be built
+            email_message.message()
+            mail.outbox.append(email_message)
+            count += 1
+        return count
+
+
+def import_aiosmtplib():
+    try:
+        import aiosmtplib
+    except ImportError:
+        raise ImproperlyConfigured(
+            'SMTPAsyncEmailBackend needs aiosmtplib, install it with '
+            '`pip install django-drip-campaigns[async]`.'
+        )
+    return aiosmtplib
+
+
+class SMTPAsyncEmailBackend(AsyncEmailBackend):
+    """
+    Sends messages over SMTP with aiosmtplib, configured by the same
+    ``EMAIL_*`` settings as Django's SMTP backend.
+    """
+
+    def __init__(self, host: str = None, port: int = None,
+                 username: str = None, password: str = None,
+                 use_tls: bool = None, use_ssl: bool = None,
+                 timeout: int = None, **kwargs):
+        super(SMTPAsyncEmailBackend, self).__init__(**kwargs)
+        self.host = host or settings.EMAIL_HOST
+        self.port = port or settings.EMAIL_PORT
+        self.username = (
+            settings.EMAIL_HOST_USER if username is None else username
+        )
+        self.password = (
+            settings.EMAIL_HOST_PASSWORD if password is None else password
+        )
+        self.use_tls = settings.EMAIL_USE_TLS if use_tls is None else use_tls
+        self.use_ssl = settings.EMAIL_USE_SSL if use_ssl is None else use_ssl
+        self.timeout = settings.EMAIL_TIMEOUT if timeout is None else timeout
+        self.client = None
+
+    async def open(self) -> bool:
+        if self.client is not None:
+            return False
+        aiosmtplib = import_aiosmtplib()
+        client = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            use_tls=self.use_ssl,
+            start_tls=self.use_tls,
+            timeout=self.timeout,
+        )
+        try:
+            await client.connect()
+            if self.username and self.password:
+                await client.login(self.username, self.password)
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return False
+        self.client = client
+        return True
+
+    async def close(self) -> None:
+        if self.client is None:
+            return
+        try:
+            await self.client.quit()
+        except Exception:
+            if not self.fail_silently:
+                raise
+        finally:
+            self.client = None
+
+    async def send_messages(self, email_messages: list) -> int:
+        if not email_messages:
+            return 0
+        await self.open()
+        if self.client is None:
+            # failed silently
+            return 0
+        count = 0
+        for email_message in email_messages:
+            recipients = email_message.recipients()
+            if not recipients:
+                continue
+            encoding = email_message.encoding or settings.DEFAULT_CHARSET
+            try:
+                await self.client.sendmail(
+                    sanitize_address(email_message.from_email, encoding),
+                    [sanitize_address(r, encoding) for r in recipients],
+                    email_message.message().as_bytes(linesep='\r\n'),
+                )
+            except Exception:
+                if not self.fail_silently:
+                    raise
+                continue
+            count += 1
+        return count
+
+
+class AsyncEngine(object):
+    """
+    Sends the messages of a drip run from an event loop.
+
+    The audience is fetched and rendered a chunk at a time in Django's
+    synchronous thread, through ``sync_to_async``, and every message is
+    then sent as its own task. At most ``concurrency`` messages are in
+    flight, each through a connection of a pool of async backends, and
+    SentDrips are recorded a chunk at a time.
+    """
+
+    def __init__(self, drip_base, MessageClass, concurrency: int = None,
+                 chunk_size: int = None):
+        self.drip_base = drip_base
+        self.MessageClass = MessageClass
+        self.concurrency = concurrency or async_concurrency()
+        self.chunk_size = chunk_size or send_chunk_size()
+        self.connections = []
+        self.idle = []
+
+    def get_connection(self):
+        return get_async_connection()
+
+    async def acquire(self):
+        if self.idle:
+            return self.idle.pop()
+        connection = self.get_connection()
+        self.connections.append(connection)
+        try:
+            await connection.open()
+        except Exception as e:
+            # retried on the first send
+            logging.error(
+                "Failed to open connection for drip {drip}: {err}".format(
+                    drip=self.drip_base.drip_model.id,
+                    err=str(e),
+                )
+            )
+        return connection
+
+    async def reset(self, connection) -> None:
+        try:
+            await connection.close()
+        except Exception:
+            pass
+
+    async def close_connections(self) -> None:
+        for connection in self.connections:
+            await self.reset(connection)
+        self.connections = []
+        self.idle = []
+
+    async def send_message(self, message) -> int:
+        if not isinstance(message, EmailMessage):
+            # sends itself, see ``DripBase.send_message``
+            return await sync_to_async(message.send)()
+        connection = await self.acquire()
+        try:
+            return await connection.send_messages([message])
+        except Exception:
+            await self.reset(connection)
+            raise
+        finally:
+            self.idle.append(connection)
+
+    async def send(self, message_instance) -> tuple:
+        with self.drip_base.stats.timer('send'), span(
+            'drip.send_messages',
+            drip_id=self.drip_base.drip_model.id,
+            user_count=1,
+        ):
+            try:
+                result = await self.send_message(message_instance.message)
+            except Exception as e:
+                # ``str(user)`` may load deferred columns, which can't
+                # be done from the event loop, the primary key is loaded
+                logging.error(
+                    "Failed to send drip {drip} to user {user}: {err}".format(
+                        drip=self.drip_base.drip_model.id,
+                        user=message_instance.user.pk,
+                        err=str(e),
+                    )
+                )
+                result = 0
+        return message_instance, result
+
+    def build_messages(self, users: list) -> list:
+        message_instances = []
+        for user in users:
+            message_instance = self.drip_base.build_message(
+                self.MessageClass, user,
+            )
+            if message_instance is not None:
+                message_instances.append(message_instance)
+        return message_instances
+
+    async def run(self) -> int:
+        count = 0
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+
+        async def send(message_instance):
+            try:
+                return await self.send(message_instance)
+            except Exception as e:
+                # still counted as a failure, whatever went wrong
+                logging.error(
+                    "Failed to send drip {drip}: {err}".format(
+                        drip=self.drip_base.drip_model.id,
+                        err=str(e),
+                    )
+                )
+                return message_instance, 0
+            finally:
+                slots.release()
+
+        def pop_results(done: set) -> list:
+            tasks.difference_update(done)
+            return [task.result() for task in done]
+
+        chunks = self.drip_base.iter_audience_chunks(self.chunk_size)
+        next_chunk = sync_to_async(lambda: next(chunks, None))
+        build_messages = sync_to_async(self.build_messages)
+        writer = SentDripWriter(stats=self.drip_base.stats)
+        try:
+            while True:
+                users = await next_chunk()
+                if users is None:
+                    break
+                for message_instance in await build_messages(users):
+                    await slots.acquire()
+                    tasks.add(asyncio.ensure_future(send(message_instance)))
+                results = pop_results(
+                    {task for task in tasks if task.done()},
+                )
+                count += await sync_to_async(self.drip_base.record_results)(
+                    writer, results,
+                )
+        finally:
+            # messages already in flight are recorded even if fetching
+            # or rendering the audience failed
+            results = []
+            if tasks:
+                done, _ = await asyncio.wait(tasks)
+                results = pop_results(done)
+            count += await sync_to_async(self.drip_base.record_results)(
+                writer, results,
+            )
+            await sync_to_async(writer.flush)()
+            await self.close_connections()
+        return count
@@ -1,15 +1,39 @@
 import operator
 import functools
 import logging
+import uuid
 
+import django
 from django.conf import settings
-from django.db.models import Q
-from django.template import Context, Template
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    IntegerField,
+    OuterRef,
+    Q,
+    Value,
+    When,
+    prefetch_related_objects,
+)
+from django.db.models.functions import Mod
+from django.template import Context
 from importlib import import_module
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import (
+    EmailMessage,
+    EmailMultiAlternatives,
+    get_connection,
+)
 from django.utils.html import strip_tags
 
-from drip.models import SentDrip
+from drip.metrics import get_collector
+from drip.models import DripRun, SentDrip
+from drip.providers import configured_context_providers
+from drip.rendering import get_template
+from drip.stats import PHASES, RunStats
+from drip.tracing import span
 from drip.utils import get_user_model
 
 try:
@@ -39,6 +63,295 @@ def message_class_for(name: str):
     return klass
 
 
+#: what ``DripMessage`` reads the user through, only its templates
+TEMPLATE_ATTRIBUTES = ('context', 'subject', 'body', 'plain', 'message')
+
+
+def reads_user_through_templates(MessageClass) -> bool:
+    """Whether ``MessageClass`` only reads the user through the subject
+    and body templates, like ``DripMessage``.
+    """
+    return all(
+        getattr(MessageClass, name) is getattr(DripMessage, name)
+        for name in TEMPLATE_ATTRIBUTES
+    )
+
+
+def sent_drip_batch_size() -> int:
+    """Number of SentDrip rows buffered before they are written with
+    a single ``bulk_create``.
+
+    :return: the ``DRIP_SENT_DRIP_BATCH_SIZE`` setting, defaults to 500
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_SENT_DRIP_BATCH_SIZE', 500)
+
+
+def send_chunk_size() -> int:
+    """Number of rendered messages handed at once to the email
+    connection that is shared by a drip run.
+
+    :return: the ``DRIP_SEND_CHUNK_SIZE`` setting, defaults to 100
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_SEND_CHUNK_SIZE', 100)
+
+
+def send_workers() -> int:
+    """Number of threads sending the messages of a drip run.
+
+    :return: the ``DRIP_SEND_WORKERS`` setting, defaults to 1, which
+        sends every message from the calling thread
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_SEND_WORKERS', 1) or 1
+
+
+def render_workers() -> int:
+    """Number of threads rendering the messages of a drip run.
+
+    :return: the ``DRIP_RENDER_WORKERS`` setting, defaults to 0, which
+        renders every message in the thread fetching the audience
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_RENDER_WORKERS', 0)
+
+
+def render_processes() -> int:
+    """Number of processes rendering the messages of a drip run.
+
+    :return: the ``DRIP_RENDER_PROCESSES`` setting, defaults to 0, which
+        renders every message in the running process
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_RENDER_PROCESSES', 0)
+
+
+def pipeline_queue_size() -> int:
+    """Number of items each queue of the send pipeline holds.
+
+    :return: the ``DRIP_PIPELINE_QUEUE_SIZE`` setting, defaults to 100
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_PIPELINE_QUEUE_SIZE', 100)
+
+
+def record_runs() -> bool:
+    """Whether every drip run is recorded as a DripRun.
+
+    Recording a run counts its audience before and after pruning, two
+    more queries per run.
+
+    :return: the ``DRIP_RECORD_RUNS`` setting, defaults to True
+    :rtype: bool
+    """
+    return getattr(settings, 'DRIP_RECORD_RUNS', True)
+
+
+def audience_chunk_size() -> int:
+    """Number of users fetched per query when streaming the audience.
+
+    :return: the ``DRIP_AUDIENCE_CHUNK_SIZE`` setting, defaults to None,
+        which loads the whole audience with a single query
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_AUDIENCE_CHUNK_SIZE', None)
+
+
+def prune_strategy() -> str:
+    """How users who already got a drip are excluded from it.
+
+    ``'exists'`` uses a correlated ``NOT EXISTS`` anti-join against the
+    SentDrips of the drip, ``'in'`` the former nested ``IN`` subqueries.
+
+    :return: the ``DRIP_PRUNE_STRATEGY`` setting, defaults to 'exists'
+    :rtype: str
+    """
+    return getattr(settings, 'DRIP_PRUNE_STRATEGY', 'exists')
+
+
+def audience_fields():
+    """User attributes loaded when sending, besides those the templates
+    read.
+
+    Paths use the queryset syntax, like ``'profile__city'``, for the
+    attributes custom message classes read. ``'__all__'`` loads every
+    column of the user model.
+
+    :return: the ``DRIP_AUDIENCE_FIELDS`` setting, defaults to None
+    :rtype: list or str
+    """
+    return getattr(settings, 'DRIP_AUDIENCE_FIELDS', None)
+
+
+def resolve_columns(Model, lookups, relations=()) -> tuple:
+    """The ``only()`` and ``select_related()`` arguments that load the
+    attribute paths ``lookups`` of ``Model`` instances.
+
+    Paths may follow forward foreign keys and one to one relations, in
+    both directions, and end on a concrete field. Returns None if any
+    path can't be loaded that way, like a method, a property or a many
+    to many relation. ``relations`` are the paths joined or prefetched
+    by other means, whose foreign keys have to be loaded too.
+    """
+    only = {Model._meta.pk.name}
+    related = set()
+    for path in relations:
+        field = Model._meta.get_field(path.split('__')[0])
+        if field.concrete:
+            only.add(field.name)
+    for path in lookups:
+        model = Model
+        prefix = []
+        for position, name in enumerate(path):
+            if name == 'pk':
+                name = model._meta.pk.name
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.is_relation:
+                only.add('__'.join(prefix + [name]))
+                break
+            if not (field.many_to_one or field.one_to_one):
+                return None
+            if position == len(path) - 1:
+                # the related instance itself, rendered as a whole
+                return None
+            if field.concrete:
+                only.add('__'.join(prefix + [name]))
+            prefix.append(name)
+            related.add('__'.join(prefix))
+            model = field.related_model
+    return sorted(only), sorted(related)
+
+
+class CompiledRules(object):
+    """
+    The queryset rules of a drip, read once and compiled into the
+    annotations and the single Q object applied to the users queryset.
+
+    Only the dates of the rules depend on "now", so the drips created by
+    ``DripBase.walk`` share one instance and just build their own Q.
+    AND rules are combined as ``~(exclude | ...) & filter & ...``, and
+    OR'ed with the OR rules.
+    """
+
+    def __init__(self, rules):
+        rules = list(rules)
+        self.and_rules = [rule for rule in rules if rule.rule_type == 'and']
+        self.or_rules = [rule for rule in rules if rule.rule_type == 'or']
+
+    def annotate(self, qs):
+        for rule in self.and_rules:
+            qs = rule.apply_any_annotation(qs)
+        return qs
+
+    def get_and_query(self, now):
+        if not self.and_rules:
+            return None
+        clauses = {
+            'filter': [],
+            'exclude': [],
+        }
+        for rule in self.and_rules:
+            clause = clauses.get(rule.method_type, clauses['filter'])
+            clause.append(Q(**rule.filter_kwargs(now=now)))
+
+        query = functools.reduce(operator.and_, clauses['filter'], Q())
+        if clauses['exclude']:
+            query &= ~functools.reduce(operator.or_, clauses['exclude'])
+        return query
+
+    def get_or_query(self, now):
+        if not self.or_rules:
+            return None
+        return functools.reduce(operator.or_, [
+            Q(**rule.filter_kwargs(now=now)) for rule in self.or_rules
+        ])
+
+    def get_query(self, now):
+        queries = [
+            query for query in (self.get_and_query(now),
+                                self.get_or_query(now))
+            if query is not None
+        ]
+        if not queries:
+            return None
+        return functools.reduce(operator.or_, queries)
+
+
+class SentDripWriter(object):
+    """
+    Buffers SentDrip rows and persists them in batches.
+
+    Every batch is written in its own transaction, so the rows of
+    batches that were already flushed are kept if a later one fails.
+    A batch that can't be bulk inserted is retried row by row. The time
+    spent writing is added to the ``persist`` phase of ``stats``.
+    """
+
+    def __init__(self, batch_size: int = None, stats: RunStats = None):
+        self.batch_size = batch_size or sent_drip_batch_size()
+        self.stats = stats
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def add(self, sent_drip) -> None:
+        self.pending.append(sent_drip)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        if self.stats is None:
+            self.write()
+        else:
+            with self.stats.timer('persist'):
+                self.write()
+
+    def write(self) -> None:
+        batch, self.pending = self.pending, []
+        with span(
+            'drip.persist', drip_id=batch[0].drip_id, user_count=len(batch),
+        ):
+            self.write_batch(batch)
+
+    def write_batch(self, batch: list) -> None:
+        try:
+            with transaction.atomic():
+                SentDrip.objects.bulk_create(batch)
+        except Exception as e:
+            logging.error(
+                "Failed to bulk save {count} sent drips: {err}".format(
+                    count=len(batch),
+                    err=str(e),
+                )
+            )
+            self.save_each(batch)
+
+    def save_each(self, batch: list) -> None:
+        for sent_drip in batch:
+            try:
+                with transaction.atomic():
+                    sent_drip.save()
+            except Exception as e:
+                logging.error(
+                    "Failed to save sent drip {drip} for user {user}: "
+                    "{err}".format(
+                        drip=sent_drip.drip_id,
+                        user=sent_drip.user_id,
+                        err=str(e),
+                    )
+                )
+
+
 class DripMessage(object):
     """[summary]
 
@@ -66,29 +379,40 @@ class DripMessage(object):
     @property
     def context(self):
         if not self._context:
-            self._context = Context({'user': self.user})
+            context = {'user': self.user}
+            context.update(self.drip_base.get_user_context(self.user))
+            self._context = Context(context)
         return self._context
 
     @property
     def subject(self):
-        if not self._subject:
-            self._subject = Template(
-                self.drip_base.subject_template,
-            ).render(self.context)
+        if self._subject is None:
+            self._subject = self.drip_base.get_subject_template().render(
+                self.context,
+            )
         return self._subject
 
     @property
     def body(self):
-        if not self._body:
-            self._body = Template(
-                self.drip_base.body_template,
-            ).render(self.context)
+        if self._body is None:
+            self._body = self.drip_base.get_body_template().render(
+                self.context,
+            )
         return self._body
 
     @property
     def plain(self):
-        if not self._plain:
-            self._plain = strip_tags(self.body)
+        if self._plain is None:
+            template = self.drip_base.get_body_template()
+            if (
+                type(self).body is DripMessage.body
+                and getattr(template, 'static', False)
+            ):
+                # the same for every user, stripped once per drip, unless
+                # a subclass builds the body some other way
+                self._plain = template.render_plain(self.context)
+            else:
+                self._plain = strip_tags(self.body)
         return self._plain
 
     def get_from_(self):
@@ -131,6 +455,12 @@ class DripBase(object):
     body_template = None
     from_email = None
     from_email_name = None
+    #: relations of the users joined to the audience query
+    select_related = ()
+    #: relations of the users prefetched for each chunk of the audience
+    prefetch_related = ()
+    #: ``ContextProvider`` instances, see ``drip.providers``
+    context_providers = ()
 
     def __init__(self, drip_model, *args, **kwargs):
         self.drip_model = drip_model
@@ -146,11 +476,31 @@ class DripBase(object):
             self.subject_template,
         )
         self.body_template = kwargs.pop('body_template', self.body_template)
+        self.select_related = kwargs.pop(
+            'select_related', self.select_related,
+        )
+        self.prefetch_related = kwargs.pop(
+            'prefetch_related', self.prefetch_related,
+        )
+        self.context_providers = kwargs.pop(
+            'context_providers', self.context_providers,
+        )
+        self._configured_context_providers = None
 
         if not self.name:
             raise AttributeError('You must define a name.')
 
+        #: counts and timings of the current run
+        self.stats = self.new_stats()
+
         self.now_shift_kwargs = kwargs.get('now_shift_kwargs', {})
+        #: rules shared by the drips of a ``walk``, see ``CompiledRules``
+        self.compiled_rules = kwargs.get('compiled_rules', None)
+        self._rules_query = None
+        self._now = None
+        #: an ``(index, count)`` pair restricting the drip to a slice
+        #: of the users, see ``apply_shard``
+        self.shard = kwargs.get('shard', None)
 
     #########################
     #   DATE MANIPULATION   #
@@ -160,8 +510,15 @@ class DripBase(object):
         """
         This allows us to override what we consider "now", making it easy
         to build timelines of who gets what when.
+
+        It is frozen on the first call, so every rule of a run is applied
+        against the same date.
         """
-        return conditional_now() + self.timedelta(**self.now_shift_kwargs)
+        if self._now is None:
+            self._now = (
+                conditional_now() + self.timedelta(**self.now_shift_kwargs)
+            )
+        return self._now
 
     def timedelta(self, *a, **kw):
         """
@@ -188,60 +545,117 @@ class DripBase(object):
                 drip_model=self.drip_model,
                 name=self.name,
                 now_shift_kwargs={'days': shift},
+                compiled_rules=self.get_compiled_rules(),
             )
             walked_range.append(self.__class__(**kwargs))
         return walked_range
 
+    def get_subject_template(self):
+        return get_template(self.subject_template, self.drip_model)
+
+    def get_body_template(self):
+        return get_template(self.body_template, self.drip_model)
+
+    def get_compiled_rules(self):
+        if self.compiled_rules is None:
+            self.compiled_rules = CompiledRules(
+                self.drip_model.queryset_rules.all(),
+            )
+        return self.compiled_rules
+
+    def get_rules_query(self):
+        """Q object with every rule of the drip for ``self.now``, or
+        None if the drip has no rules.
+        """
+        if self._rules_query is None:
+            self._rules_query = self.get_compiled_rules().get_query(self.now)
+        return self._rules_query
+
     def apply_queryset_rules(self, qs: str) -> str:
-        return (
-                self.apply_and_queryset_rules(qs) |
-                self.apply_or_queryset_rules(qs)
-               )
+        query = self.get_rules_query()
+        if query is None:
+            return qs.none()
+        return self.get_compiled_rules().annotate(qs).filter(query)
 
     def apply_or_queryset_rules(self, qs: str) -> str:
-        rules = []
-        rule_set = self.drip_model.queryset_rules.filter(rule_type='or')
-        for rule in rule_set:
-            kwargs = rule.filter_kwargs(now=self.now)
-            query_or = Q(**kwargs)
-            rules.append(query_or)
-
-        query = rules.pop() if rules else None
-        for rule in rules:
-            query |= rule
+        query = self.get_compiled_rules().get_or_query(self.now)
         qs = qs.filter(query) if query else qs.none()
         return qs
 
     def apply_and_queryset_rules(self, qs: str) -> str:
-        """First collect all filter/exclude kwargs and apply any annotations.
-        Then apply all filters at once, and all excludes at once.
+        """Apply any annotations, then all filters and excludes at once.
 
         :param qs: [description]
         :type qs: str
         :return: [description]
         :rtype: str
         """
-        clauses = {
-            'filter': [],
-            'exclude': [],
-        }
-        rules = []
-        for rule in self.drip_model.queryset_rules.filter(rule_type='and'):
-            rules.append(rule)
-
-            clause = clauses.get(rule.method_type, clauses['filter'])
-
-            kwargs = rule.filter_kwargs(now=self.now)
-            clause.append(Q(**kwargs))
-
-            qs = rule.apply_any_annotation(qs)
-
-        if clauses['exclude']:
-            qs = qs.exclude(functools.reduce(operator.or_, clauses['exclude']))
-
-        qs = qs.filter(*clauses['filter']) if len(rules) > 0 else qs.none()
-
-        return qs
+        compiled_rules = self.get_compiled_rules()
+        query = compiled_rules.get_and_query(self.now)
+        if query is None:
+            return qs.none()
+        return compiled_rules.annotate(qs).filter(query)
+
+    def get_first_day_users(self, shifted_drips: list):
+        """The users annotated with ``drip_first_day``, the index of the
+        first of ``shifted_drips`` that they would get, as in a timeline
+        built with ``walk``.
+
+        Every shifted drip becomes an ``EXISTS`` subquery and a ``CASE``
+        picks the first one each user matches, so the whole window takes
+        a single query instead of a prune and a queryset per day. Users
+        who already got the drip are pruned, and those who get none of
+        the shifted drips left out.
+        """
+        if self.get_rules_query() is None:
+            return self.queryset().none()
+
+        annotations = {}
+        whens = []
+        for day, shifted_drip in enumerate(shifted_drips):
+            name = 'drip_day_{day}'.format(day=day)
+            annotations[name] = Exists(
+                shifted_drip.apply_queryset_rules(
+                    shifted_drip.queryset(),
+                ).filter(pk=OuterRef('pk'))
+            )
+            whens.append(When(**{name: True, 'then': Value(day)}))
+
+        return self.apply_prune(self.queryset()).annotate(
+            **annotations
+        ).annotate(
+            drip_first_day=Case(*whens, output_field=IntegerField()),
+        ).filter(
+            drip_first_day__isnull=False,
+        ).order_by('drip_first_day', 'pk')
+
+    def get_first_days(self, shifted_drips: list) -> list:
+        """Bucket the users by the first of ``shifted_drips`` that they
+        would get, see ``get_first_day_users``.
+
+        :return: one list of user primary keys per shifted drip
+        :rtype: list
+        """
+        days = [[] for _ in shifted_drips]
+        users = self.get_first_day_users(shifted_drips)
+        for pk, day in users.values_list('pk', 'drip_first_day'):
+            days[day].append(pk)
+        return days
+
+    def count_first_days(self, shifted_drips: list) -> list:
+        """Count the users of each day of ``get_first_days``, with one
+        aggregate query.
+
+        :return: the count of users per shifted drip
+        :rtype: list
+        """
+        counts = [0] * len(shifted_drips)
+        users = self.get_first_day_users(shifted_drips).order_by()
+        for day, count in users.values('drip_first_day').annotate(
+            count=Count('pk'),
+        ).values_list('drip_first_day', 'count'):
+            counts[day] = count
+        return counts
 
     ##################
     #   MANAGEMENT   #
@@ -257,11 +671,252 @@ class DripBase(object):
         """
         queryset = getattr(self, '_queryset', None)
         if queryset is None:
-            self._queryset = self.apply_queryset_rules(
-                self.queryset(),
+            self._queryset = self.apply_shard(
+                self.apply_queryset_rules(self.queryset()),
             ).distinct()
         return self._queryset
 
+    def apply_shard(self, queryset, prefix: str = None):
+        """Keep only the users of ``self.shard``.
+
+        Shards split users on their primary key, so every user belongs
+        to exactly one shard and separate processes can run the same
+        drip without overlapping. Integer keys are split by modulo,
+        UUID keys in contiguous ranges of the UUID space. ``prefix`` is
+        the path to the user from the model of ``queryset``.
+        """
+        if not self.shard:
+            return queryset
+        index, count = self.shard
+
+        Model = queryset.model
+        if prefix:
+            Model = Model._meta.get_field(prefix).related_model
+        pk = '{prefix}__pk'.format(prefix=prefix) if prefix else 'pk'
+        pk_field = Model._meta.pk
+        while pk_field.is_relation:
+            pk_field = pk_field.target_field
+
+        if pk_field.get_internal_type() == 'UUIDField':
+            space = 2 ** 128
+            query = Q(**{
+                pk + '__gte': uuid.UUID(int=index * space // count),
+            })
+            if index + 1 < count:
+                query &= Q(**{
+                    pk + '__lt': uuid.UUID(int=(index + 1) * space // count),
+                })
+            return queryset.filter(query)
+
+        return queryset.annotate(
+            drip_shard=Mod(pk, count),
+        ).filter(drip_shard=index)
+
+    def get_audience_lookups(self):
+        """The attribute paths of the users read while sending, or None
+        when they can't all be known.
+        """
+        fields = audience_fields()
+        if fields == '__all__':
+            return None
+        if fields is None:
+            # custom message classes may read anything, unless the
+            # attributes they read are listed in the setting
+            try:
+                MessageClass = message_class_for(
+                    self.drip_model.message_class,
+                )
+            except KeyError:
+                return None
+            if not reads_user_through_templates(MessageClass):
+                return None
+        lookups = {('email',)}
+        for template in (
+            self.get_subject_template(), self.get_body_template(),
+        ):
+            user_lookups = getattr(template, 'user_lookups', None)
+            if user_lookups is None:
+                return None
+            lookups.update(user_lookups)
+        lookups.update(tuple(field.split('__')) for field in fields or ())
+        return lookups
+
+    def apply_audience_columns(self, qs, prefix: str = None):
+        """Only select the columns of the users read while sending.
+
+        The columns come from the attributes the subject and body
+        templates read, the email and ``DRIP_AUDIENCE_FIELDS``. Drips
+        with a message class reading the user otherwise are only pruned
+        when that setting is set. Any
+        other attribute is still loaded when first read, with one query
+        per user. ``prefix`` is the path to the user from the model of
+        ``qs``.
+        """
+        lookups = self.get_audience_lookups()
+        if lookups is None:
+            return qs
+        Model = qs.model
+        if prefix:
+            Model = Model._meta.get_field(prefix).related_model
+        relations = list(self.select_related) + [
+            getattr(lookup, 'prefetch_through', lookup)
+            for lookup in self.prefetch_related
+        ]
+        columns = resolve_columns(Model, lookups, relations)
+        if columns is None:
+            return qs
+        only, related = columns
+        if prefix:
+            only = [prefix] + [
+                '{prefix}__{field}'.format(prefix=prefix, field=field)
+                for field in only
+            ]
+            related = [prefix] + [
+                '{prefix}__{field}'.format(prefix=prefix, field=field)
+                for field in related
+            ]
+        if related:
+            qs = qs.select_related(*related)
+        return qs.only(*only)
+
+    def apply_related(self, qs, prefix: str = None):
+        """Join the ``select_related`` relations of the users.
+
+        ``prefix`` is the path to the user from the model of ``qs``.
+        """
+        related = [
+            '{prefix}__{path}'.format(prefix=prefix, path=path)
+            if prefix else path
+            for path in self.select_related
+        ]
+        if related:
+            qs = qs.select_related(*related)
+        return qs
+
+    def get_context_providers(self) -> list:
+        if self._configured_context_providers is None:
+            self._configured_context_providers = (
+                configured_context_providers()
+            )
+        return (
+            list(self.context_providers) + self._configured_context_providers
+        )
+
+    def prepare_audience(self, users: list) -> list:
+        """Get a chunk of users ready to be rendered.
+
+        Their ``prefetch_related`` relations are prefetched and every
+        context provider loads their extra context, with one query per
+        ``DRIP_SEND_CHUNK_SIZE`` users instead of one per user. The
+        whole audience, when it isn't fetched in chunks, doesn't end up
+        in a single ``IN`` clause.
+        """
+        contexts = {user.pk: {} for user in users}
+        providers = self.get_context_providers()
+        batch_size = send_chunk_size()
+        for start in range(0, len(users), batch_size):
+            batch = users[start:start + batch_size]
+            if self.prefetch_related:
+                prefetch_related_objects(batch, *self.prefetch_related)
+            for provider in providers:
+                for pk, context in provider.load(self, batch).items():
+                    if pk in contexts:
+                        contexts[pk].update(context)
+        for user in users:
+            user._drip_context = contexts[user.pk]
+        return users
+
+    def get_user_context(self, user) -> dict:
+        """The extra context of ``user``, loaded on its own if its chunk
+        wasn't prepared.
+        """
+        context = getattr(user, '_drip_context', None)
+        if context is None:
+            self.prepare_audience([user])
+            context = user._drip_context
+        return context
+
+    def iter_audience_chunks(self, chunk_size: int = None):
+        """Yield the users of the queryset as lists.
+
+        With a chunk size, either given or from
+        ``DRIP_AUDIENCE_CHUNK_SIZE``, the queryset is paginated on its
+        primary key (keyset pagination), so at most ``chunk_size`` users
+        are held in memory. Any ordered primary key works, integer
+        or UUID.
+        """
+        chunk_size = chunk_size or audience_chunk_size()
+        queryset = self.apply_audience_columns(
+            self.apply_related(self.get_queryset()),
+        )
+        if not chunk_size:
+            users = self.fetch_audience(queryset, 0)
+            if users:
+                yield users
+            return
+
+        queryset = queryset.order_by('pk')
+        last_pk = None
+        batch_index = 0
+        while True:
+            page = queryset
+            if last_pk is not None:
+                page = queryset.filter(pk__gt=last_pk)
+            users = self.fetch_audience(page[:chunk_size], batch_index)
+            if users:
+                yield users
+            if len(users) < chunk_size:
+                return
+            last_pk = users[-1].pk
+            batch_index += 1
+
+    def fetch_audience(self, queryset, batch_index: int = None) -> list:
+        """Fetch and prepare a chunk of users, in the ``query`` phase."""
+        with self.stats.timer('query'), span(
+            'drip.query', drip_id=self.drip_model.id, batch_index=batch_index,
+        ) as query_span:
+            users = list(queryset)
+            if users:
+                self.prepare_audience(users)
+            query_span.set_attribute('user_count', len(users))
+        return users
+
+    def iter_audience_ids(self, chunk_size: int):
+        """Yield the primary keys of the queryset as lists of at most
+        ``chunk_size``, paginated like ``iter_audience_chunks``.
+        """
+        queryset = self.get_queryset().order_by('pk').values_list(
+            'pk', flat=True,
+        )
+        last_pk = None
+        batch_index = 0
+        while True:
+            page = queryset
+            if last_pk is not None:
+                page = queryset.filter(pk__gt=last_pk)
+            with self.stats.timer('query'), span(
+                'drip.query',
+                drip_id=self.drip_model.id,
+                batch_index=batch_index,
+            ) as query_span:
+                user_ids = list(page[:chunk_size])
+                query_span.set_attribute('user_count', len(user_ids))
+            if user_ids:
+                yield user_ids
+            if len(user_ids) < chunk_size:
+                return
+            last_pk = user_ids[-1]
+            batch_index += 1
+
+    def iter_audience(self, chunk_size: int = None):
+        """Yield, one by one, the users of the queryset.
+
+        See ``iter_audience_chunks``.
+        """
+        for users in self.iter_audience_chunks(chunk_size):
+            for user in users:
+                yield user
+
     def run(self) -> int:
         """Get the queryset, prune sent people, and send it.
 
@@ -273,63 +928,335 @@ class DripBase(object):
         if not self.drip_model.enabled:
             return None
 
-        self.prune()
-        count = self.send()
+        self.stats = self.new_stats()
+        with span(
+            'drip.run', drip_id=self.drip_model.id,
+        ) as run_span, self.stats.count_queries():
+            self.start_run()
+            try:
+                count = self.send()
+            finally:
+                self.finish_run()
+            run_span.set_attribute('user_count', count)
 
         return count
 
+    def new_stats(self) -> RunStats:
+        """Stats of a run, reporting to the metrics collector."""
+        return RunStats(collector=get_collector(), labels={'drip': self.name})
+
+    def start_run(self) -> None:
+        """Prune the queryset.
+
+        When runs are recorded the audience is counted before and after
+        pruning.
+        """
+        self.stats.started_at = conditional_now()
+        record = record_runs()
+        if record:
+            with self.stats.timer('query'):
+                self.stats.audience = self.get_queryset().count()
+        with self.stats.timer('prune'), span(
+            'drip.prune', drip_id=self.drip_model.id,
+        ) as prune_span:
+            self.prune()
+            if record:
+                self.stats.pruned = (
+                    self.stats.audience - self.get_queryset().count()
+                )
+                prune_span.set_attribute('user_count', self.stats.pruned)
+
+    def finish_run(self) -> None:
+        """Record the run as a DripRun, when runs are recorded."""
+        self.stats.finished_at = conditional_now()
+        if not record_runs() or self.drip_model.pk is None:
+            return
+        timings = {
+            '{phase}_time'.format(phase=phase): self.stats.timings[phase]
+            for phase in PHASES
+        }
+        try:
+            DripRun.objects.create(
+                drip=self.drip_model,
+                started_at=self.stats.started_at,
+                finished_at=self.stats.finished_at,
+                audience=self.stats.audience,
+                pruned=self.stats.pruned,
+                sent=self.stats.sent,
+                failures=self.stats.failures,
+                **timings
+            )
+        except Exception as e:
+            logging.error(
+                "Failed to record run of drip {drip}: {err}".format(
+                    drip=self.drip_model.id,
+                    err=str(e),
+                )
+            )
+
     def prune(self):
         """Do an exclude for all Users who have a SentDrip already.
         """
-        target_user_ids = self.get_queryset().values_list('id', flat=True)
-        exclude_user_ids = SentDrip.objects.filter(
+        self._queryset = self.apply_prune(self.get_queryset())
+
+    def apply_prune(self, queryset):
+        strategies = {
+            'exists': self.prune_with_exists,
+            'in': self.prune_with_in,
+        }
+        strategy = prune_strategy()
+        if strategy not in strategies:
+            raise ImproperlyConfigured(
+                'Unknown DRIP_PRUNE_STRATEGY `{strategy}`.'.format(
+                    strategy=strategy,
+                )
+            )
+        return strategies[strategy](queryset)
+
+    def get_sent_drips(self):
+        return SentDrip.objects.filter(
             date__lt=conditional_now(),
             drip=self.drip_model,
+        )
+
+    def prune_with_exists(self, queryset):
+        already_sent = self.get_sent_drips().filter(user=OuterRef('pk'))
+        if django.VERSION >= (3, 0):
+            return queryset.filter(~Exists(already_sent))
+        # Django 2.2 can only filter on an annotated Exists
+        return queryset.annotate(
+            drip_already_sent=Exists(already_sent),
+        ).filter(drip_already_sent=False)
+
+    def prune_with_in(self, queryset):
+        target_user_ids = queryset.values_list('id', flat=True)
+        exclude_user_ids = self.get_sent_drips().filter(
             user__id__in=target_user_ids
         ).values_list('user_id', flat=True)
-        self._queryset = self.get_queryset().exclude(id__in=exclude_user_ids)
+        return queryset.exclude(id__in=exclude_user_ids)
 
-    def get_count_from_queryset(self, MessageClass) -> int:
+    def build_sent_drip(self, user, message_instance):
+        """Build, without saving, the SentDrip that records
+        ``message_instance`` was sent to ``user``.
+        """
+        return SentDrip(
+            drip=self.drip_model,
+            user=user,
+            from_email=self.from_email,
+            from_email_name=self.from_email_name,
+            subject=message_instance.subject,
+            body=message_instance.body
+        )
+
+    def log_send_error(self, user, error: Exception) -> None:
+        logging.error(
+            "Failed to send drip {drip} to user {user}: {err}".format(
+                drip=self.drip_model.id,
+                user=str(user),
+                err=str(error),
+            )
+        )
+
+    def build_message(self, MessageClass, user):
+        """Create and render the message for ``user``.
+
+        Returns None, after logging, if the message can't be built.
+        """
+        message_instance = MessageClass(self, user)
+        try:
+            with self.stats.timer('render'), span(
+                'drip.render', drip_id=self.drip_model.id, user_id=user.pk,
+            ):
+                message_instance.message
+        except Exception as e:
+            self.log_send_error(user, e)
+            self.stats.add_results(0, failures=1)
+            return None
+        self.stats.add_rendered()
+        return message_instance
+
+    def get_connection(self):
+        """Email backend connection shared by every message of a run."""
+        return get_connection()
+
+    def reset_connection(self, connection) -> None:
+        """Drop a connection that failed, so the next message gets
+        a fresh one.
+        """
+        try:
+            connection.close()
+            connection.open()
+        except Exception as e:
+            logging.error(
+                "Failed to reopen connection for drip {drip}: {err}".format(
+                    drip=self.drip_model.id,
+                    err=str(e),
+                )
+            )
+
+    def send_message(self, connection, message) -> int:
+        if isinstance(message, EmailMessage):
+            return connection.send_messages([message])
+        return message.send()
+
+    def send_messages(self, connection, message_instances: list) -> list:
+        """Send a chunk of messages through an open ``connection``.
+
+        ``send_messages`` only reports how many messages of a list went
+        out, so every message is passed on its own to keep track of
+        which users got it. Messages that aren't an ``EmailMessage``
+        only need a ``send()`` method, and send themselves.
+
+        :return: a ``(message_instance, result)`` pair for each message
+        :rtype: list
+        """
+        results = []
+        with span(
+            'drip.send_messages',
+            drip_id=self.drip_model.id,
+            user_count=len(message_instances),
+        ):
+            for message_instance in message_instances:
+                try:
+                    with self.stats.timer('send'):
+                        result = self.send_message(
+                            connection, message_instance.message,
+                        )
+                except Exception as e:
+                    self.log_send_error(message_instance.user, e)
+                    self.reset_connection(connection)
+                    result = 0
+                results.append((message_instance, result))
+        return results
+
+    def record_results(self, writer: SentDripWriter, results: list) -> int:
         count = 0
-        for user in self.get_queryset():
-            message_instance = MessageClass(self, user)
-            try:
-                result = message_instance.message.send()
-                if result:
-                    SentDrip.objects.create(
-                        drip=self.drip_model,
-                        user=user,
-                        from_email=self.from_email,
-                        from_email_name=self.from_email_name,
-                        subject=message_instance.subject,
-                        body=message_instance.body
-                    )
-                    count += 1
-            except Exception as e:
-                logging.error(
-                    "Failed to send drip {drip} to user {user}: {err}".format(
-                        drip=self.drip_model.id,
-                        user=str(user),
-                        err=str(e),
-                    )
+        for message_instance, result in results:
+            if result:
+                writer.add(
+                    self.build_sent_drip(
+                        message_instance.user, message_instance,
+                    ),
                 )
+                count += 1
+        self.stats.add_results(count, failures=len(results) - count)
         return count
 
-    def send(self):
-        """Send the message to each user on the queryset.
+    def open_connection(self):
+        connection = self.get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            # the backend will retry opening it on the first send
+            logging.error(
+                "Failed to open connection for drip {drip}: {err}".format(
+                    drip=self.drip_model.id,
+                    err=str(e),
+                )
+            )
+        return connection
 
-        Create SentDrip for each user that gets a message.
+    def get_count_from_queryset(self, MessageClass) -> int:
+        workers = send_workers()
+        if render_processes() > 0:
+            from drip.engines import ProcessEngine
+            return ProcessEngine(self, MessageClass, render_processes()).run()
+        if render_workers() > 0:
+            from drip.engines import PipelineEngine
+            return PipelineEngine(
+                self, MessageClass, render_workers(), workers,
+            ).run()
+        if workers > 1:
+            from drip.engines import ThreadedEngine
+            return ThreadedEngine(self, MessageClass, workers).run()
 
-        Returns count of created SentDrips.
-        """
+        count = 0
+        chunk_size = send_chunk_size()
+        connection = self.open_connection()
+        try:
+            with SentDripWriter(stats=self.stats) as writer:
+                chunk = []
+                for user in self.iter_audience():
+                    message_instance = self.build_message(MessageClass, user)
+                    if message_instance is None:
+                        continue
+                    chunk.append(message_instance)
+                    if len(chunk) >= chunk_size:
+                        count += self.record_results(
+                            writer, self.send_messages(connection, chunk),
+                        )
+                        chunk = []
+                count += self.record_results(
+                    writer, self.send_messages(connection, chunk),
+                )
+        finally:
+            connection.close()
+        return count
 
+    def get_message_class(self):
+        """The message class of the drip, once its sender is set."""
         if not self.from_email:
             self.from_email = getattr(
                 settings,
                 'DRIP_FROM_EMAIL',
                 settings.DEFAULT_FROM_EMAIL,
             )
-        MessageClass = message_class_for(self.drip_model.message_class)
+        return message_class_for(self.drip_model.message_class)
+
+    async def arun(self):
+        """Like ``run``, from an event loop."""
+        from asgiref.sync import sync_to_async
+
+        if not self.drip_model.enabled:
+            return None
+
+        # database queries are made from another thread, and not counted
+        self.stats = self.new_stats()
+        with span('drip.run', drip_id=self.drip_model.id) as run_span:
+            await sync_to_async(self.start_run)()
+            try:
+                count = await self.asend()
+            finally:
+                await sync_to_async(self.finish_run)()
+            run_span.set_attribute('user_count', count)
+        return count
+
+    async def asend(self):
+        """Like ``send``, from an event loop.
+
+        Messages are sent concurrently through an async email backend,
+        see ``drip.aio.AsyncEngine``. The outbox is still sent
+        synchronously, in Django's synchronous thread.
+        """
+        from asgiref.sync import sync_to_async
+        from drip.aio import AsyncEngine
+        from drip.outbox import outbox_enabled
+
+        if outbox_enabled():
+            return await sync_to_async(self.send)()
+        MessageClass = self.get_message_class()
+        return await AsyncEngine(self, MessageClass).run()
+
+    def send(self):
+        """Send the message to each user on the queryset.
+
+        Create SentDrip for each user that gets a message.
+
+        Returns count of created SentDrips.
+        """
+        with span('drip.send', drip_id=self.drip_model.id) as send_span:
+            count = self.send_audience()
+            send_span.set_attribute('user_count', count)
+        return count
+
+    def send_audience(self) -> int:
+        MessageClass = self.get_message_class()
+
+        from drip.outbox import Outbox, outbox_enabled
+        if outbox_enabled():
+            outbox = Outbox(self)
+            outbox.enqueue()
+            return outbox.send(MessageClass)
 
         return self.get_count_from_queryset(MessageClass)
 
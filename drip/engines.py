@@ -0,0 +1,354 @@
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from time import perf_counter
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections as db_connections
+
+from drip.drips import SentDripWriter, pipeline_queue_size, send_chunk_size
+from drip.render_worker import (
+    get_drip_state,
+    get_users,
+    init_render_process,
+    render_chunk,
+)
+
+#: marks the end of the items of a pipeline queue
+STOP = object()
+#: whether process pools take a start method and an initializer
+PROCESS_POOL_INITIALIZER = sys.version_info >= (3, 7)
+
+
+class ThreadedConnections(object):
+    """
+    Gives each thread of an engine its own email backend connection,
+    and closes them all once the run is over.
+    """
+
+    def get_connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.drip_base.open_connection()
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def close_connections(self) -> None:
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+
+
+class ThreadedEngine(ThreadedConnections):
+    """
+    Sends the messages of a drip run from a pool of threads.
+
+    Messages are rendered in the calling thread and handed to at most
+    ``workers`` threads, each sending through its own backend
+    connection. No more than ``max_pending`` messages wait to be sent at
+    any time, so rendering can't run ahead of sending. SentDrips are
+    only written by the calling thread, which keeps database access off
+    the workers.
+    """
+
+    def __init__(self, drip_base, MessageClass, workers: int,
+                 max_pending: int = None):
+        self.drip_base = drip_base
+        self.MessageClass = MessageClass
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+
+    def send(self, message_instance) -> tuple:
+        return self.drip_base.send_messages(
+            self.get_connection(), [message_instance],
+        )[0]
+
+    def record(self, writer: SentDripWriter, futures) -> int:
+        return self.drip_base.record_results(
+            writer, [future.result() for future in futures],
+        )
+
+    def run(self) -> int:
+        count = 0
+        pending = set()
+        with SentDripWriter(stats=self.drip_base.stats) as writer:
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+            try:
+                for user in self.drip_base.iter_audience():
+                    message_instance = self.drip_base.build_message(
+                        self.MessageClass, user,
+                    )
+                    if message_instance is None:
+                        continue
+                    if len(pending) >= self.max_pending:
+                        done, pending = wait(
+                            pending, return_when=FIRST_COMPLETED,
+                        )
+                        count += self.record(writer, done)
+                    pending.add(executor.submit(self.send, message_instance))
+            finally:
+                # messages already handed to the workers are recorded
+                # even if fetching or rendering the audience failed
+                done, pending = wait(pending)
+                count += self.record(writer, done)
+                executor.shutdown()
+                self.close_connections()
+        return count
+
+
+class PipelineEngine(ThreadedConnections):
+    """
+    Sends the messages of a drip run through a staged pipeline.
+
+    The calling thread fetches the audience and hands the users to
+    ``render_workers`` threads, which render their messages and hand
+    them to ``send_workers`` threads, each sending through its own
+    backend connection. The results come back to the calling thread,
+    which records the SentDrips. Stages are connected by queues of at
+    most ``queue_size`` items, so no stage can run far ahead of the
+    next one, and rendering overlaps with sending.
+
+    The audience, with the context of its users, is fetched before it
+    is rendered, and SentDrips are written by the calling thread, so
+    render workers only query the database for attributes a message
+    reads that weren't fetched.
+    """
+
+    def __init__(self, drip_base, MessageClass, render_workers: int,
+                 send_workers: int, queue_size: int = None):
+        self.drip_base = drip_base
+        self.MessageClass = MessageClass
+        self.render_workers = render_workers
+        self.send_workers = send_workers
+        queue_size = queue_size or pipeline_queue_size()
+        self.users = queue.Queue(maxsize=queue_size)
+        self.messages = queue.Queue(maxsize=queue_size)
+        # only holds what went through the bounded queues before it
+        self.results = queue.Queue()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+        self.renderers_left = render_workers
+        self.senders_left = send_workers
+
+    def render(self) -> None:
+        try:
+            while True:
+                user = self.users.get()
+                if user is STOP:
+                    break
+                message_instance = self.drip_base.build_message(
+                    self.MessageClass, user,
+                )
+                if message_instance is not None:
+                    self.messages.put(message_instance)
+        finally:
+            # close the database connections of this thread, opened by
+            # messages reading attributes that weren't fetched
+            db_connections.close_all()
+            with self.lock:
+                self.renderers_left -= 1
+                last = not self.renderers_left
+            if last:
+                for _ in range(self.send_workers):
+                    self.messages.put(STOP)
+
+    def send(self) -> None:
+        try:
+            while True:
+                message_instance = self.messages.get()
+                if message_instance is STOP:
+                    break
+                self.results.put(
+                    self.drip_base.send_messages(
+                        self.get_connection(), [message_instance],
+                    )[0]
+                )
+        finally:
+            self.results.put(STOP)
+
+    def record(self, writer: SentDripWriter, block: bool = False) -> int:
+        """Record the results sent so far, or wait for the next one when
+        ``block`` is set.
+        """
+        results = []
+        while True:
+            try:
+                result = self.results.get(block=block)
+            except queue.Empty:
+                break
+            if result is STOP:
+                self.senders_left -= 1
+            else:
+                results.append(result)
+            if block:
+                break
+        return self.drip_base.record_results(writer, results)
+
+    def start(self, target, count: int) -> list:
+        threads = [
+            threading.Thread(target=target, daemon=True)
+            for _ in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def run(self) -> int:
+        count = 0
+        threads = self.start(self.render, self.render_workers)
+        threads += self.start(self.send, self.send_workers)
+        with SentDripWriter(stats=self.drip_base.stats) as writer:
+            try:
+                for user in self.drip_base.iter_audience():
+                    count += self.record(writer)
+                    self.users.put(user)
+            finally:
+                # users already handed to the workers are sent and
+                # recorded even if fetching the audience failed
+                for _ in range(self.render_workers):
+                    self.users.put(STOP)
+                while self.senders_left:
+                    count += self.record(writer, block=True)
+                for thread in threads:
+                    thread.join()
+                self.close_connections()
+        return count
+
+
+class ProcessEngine(object):
+    """
+    Renders the messages of a drip run in a pool of processes.
+
+    Rendering is bound by the GIL, so threads don't speed up heavy
+    templates. The calling process pages through the ids of the
+    audience and hands them, ``chunk_size`` at a time, to ``processes``
+    render processes, each setting Django up, and building the drip,
+    once. Those load the users and send back the subject, body and
+    plain body of their messages. The calling process then sends the
+    messages, through a single connection, and records the SentDrips.
+
+    Render processes are spawned and read ``DJANGO_SETTINGS_MODULE``, so
+    settings configured in code aren't supported.
+    """
+
+    def __init__(self, drip_base, MessageClass, processes: int,
+                 chunk_size: int = None, max_pending: int = None):
+        self.drip_base = drip_base
+        self.MessageClass = MessageClass
+        self.processes = processes
+        self.chunk_size = chunk_size or send_chunk_size()
+        self.max_pending = max_pending or processes * 2
+
+    def get_executor(self):
+        if not PROCESS_POOL_INITIALIZER:
+            raise ImproperlyConfigured(
+                'DRIP_RENDER_PROCESSES needs Python 3.7 or later, set it '
+                'to 0 or use DRIP_RENDER_WORKERS instead.'
+            )
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_render_process,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE'),),
+        )
+
+    def build_messages(self, rendered: dict) -> list:
+        users = get_users(self.drip_base, self.UserModel, list(rendered))
+        message_instances = []
+        for pk, (subject, body, plain) in rendered.items():
+            if pk not in users:
+                continue
+            message_instance = self.MessageClass(self.drip_base, users[pk])
+            message_instance._subject = subject
+            message_instance._body = body
+            message_instance._plain = plain
+            message_instances.append(message_instance)
+        return message_instances
+
+    def wait(self, futures, **kwargs) -> tuple:
+        """Wait for rendered chunks, time spent in the ``render`` phase
+        of the run.
+        """
+        start = perf_counter()
+        try:
+            return wait(futures, **kwargs)
+        finally:
+            self.drip_base.stats.add_time('render', perf_counter() - start)
+
+    def send(self, writer: SentDripWriter, connection, futures) -> int:
+        count = 0
+        for future in futures:
+            user_ids = self.chunks.pop(future)
+            try:
+                rendered = future.result()
+            except Exception as e:
+                logging.error(
+                    "Failed to render drip {drip} for {count} users: "
+                    "{err}".format(
+                        drip=self.drip_base.drip_model.id,
+                        count=len(user_ids),
+                        err=str(e),
+                    )
+                )
+                self.drip_base.stats.add_results(0, failures=len(user_ids))
+                continue
+            self.drip_base.stats.add_rendered(len(rendered))
+            # users whose message failed to render in the render process
+            self.drip_base.stats.add_results(
+                0, failures=len(user_ids) - len(rendered),
+            )
+            results = self.drip_base.send_messages(
+                connection, self.build_messages(rendered),
+            )
+            count += self.drip_base.record_results(writer, results)
+        return count
+
+    def run(self) -> int:
+        count = 0
+        drip_state = get_drip_state(self.drip_base)
+        self.UserModel = self.drip_base.get_queryset().model
+        self.chunks = {}
+        pending = set()
+        executor = self.get_executor()
+        connection = self.drip_base.open_connection()
+        try:
+            with SentDripWriter(stats=self.drip_base.stats) as writer:
+                try:
+                    for user_ids in self.drip_base.iter_audience_ids(
+                        self.chunk_size,
+                    ):
+                        if len(pending) >= self.max_pending:
+                            done, pending = self.wait(
+                                pending, return_when=FIRST_COMPLETED,
+                            )
+                            count += self.send(writer, connection, done)
+                        future = executor.submit(
+                            render_chunk, drip_state, self.UserModel,
+                            self.MessageClass, user_ids,
+                        )
+                        self.chunks[future] = user_ids
+                        pending.add(future)
+                finally:
+                    # chunks already rendered are sent and recorded even
+                    # if paging through the audience failed
+                    done, pending = self.wait(pending)
+                    count += self.send(writer, connection, done)
+        finally:
+            executor.shutdown()
+            connection.close()
+        return count
@@ -1,8 +1,28 @@
 import re
 import datetime
+from functools import lru_cache
 
 STRFDATETIME = re.compile('([dgGhHis])')
 
+# This is the more flexible format
+FLEXIBLE_REGEX = re.compile(
+    r'^((?P<weeks>-?((\d*\.\d+)|\d+))\W*w((ee)?(k(s)?)?)(,)?\W*)?'
+    r'((?P<days>-?((\d*\.\d+)|\d+))\W*d(ay(s)?)?(,)?\W*)?'
+    r'((?P<hours>-?((\d*\.\d+)|\d+))\W*h(ou)?(r(s)?)?(,)?\W*)?'
+    r'((?P<minutes>-?((\d*\.\d+)|\d+))\W*m(in(ute)?(s)?)?(,)?\W*)?'
+    r'((?P<seconds>-?((\d*\.\d+)|\d+))\W*s(ec(ond)?(s)?)?)?\W*$'
+)
+
+# This is the format we get from sometimes Postgres, sqlite,
+# and from serialization
+STRING_REGEX = re.compile(
+    r'^((?P<days>[-+]?\d+) days?,? )?(?P<sign>[-+]?)(?P<hours>\d+):'
+    r'(?P<minutes>\d+)(:(?P<seconds>\d+(\.\d+)?))?$'
+)
+
+# Number of distinct intervals whose parsed timedelta is kept
+PARSE_CACHE_SIZE = 1024
+
 
 def STRFDATETIME_REPL(x):
     return '%({group})s'.format(group=x.group())
@@ -18,15 +38,7 @@ def process_regex(d):
 
 
 def get_flexible_regex(string):
-    # This is the more flexible format
-    d = re.match(
-        r'^((?P<weeks>-?((\d*\.\d+)|\d+))\W*w((ee)?(k(s)?)?)(,)?\W*)?'
-        r'((?P<days>-?((\d*\.\d+)|\d+))\W*d(ay(s)?)?(,)?\W*)?'
-        r'((?P<hours>-?((\d*\.\d+)|\d+))\W*h(ou)?(r(s)?)?(,)?\W*)?'
-        r'((?P<minutes>-?((\d*\.\d+)|\d+))\W*m(in(ute)?(s)?)?(,)?\W*)?'
-        r'((?P<seconds>-?((\d*\.\d+)|\d+))\W*s(ec(ond)?(s)?)?)?\W*$',
-        string,
-    )
+    d = FLEXIBLE_REGEX.match(string)
     if not d:
         raise TypeError(
             "'{string}' is not a valid time interval".format(string=string)
@@ -36,13 +48,7 @@ def get_flexible_regex(string):
 
 
 def process_string(string):
-    # This is the format we get from sometimes Postgres, sqlite,
-    # and from serialization
-    d = re.match(
-        r'^((?P<days>[-+]?\d+) days?,? )?(?P<sign>[-+]?)(?P<hours>\d+):'
-        r'(?P<minutes>\d+)(:(?P<seconds>\d+(\.\d+)?))?$',
-        str(string),
-    )
+    d = STRING_REGEX.match(str(string))
     if d:
         d = process_regex(d)
     else:
@@ -50,9 +56,13 @@ def process_string(string):
     return datetime.timedelta(**dict(((k, float(v)) for k, v in d.items())))
 
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse(string):
     """
     Parse a string into a timedelta object.
+
+    Timedeltas are immutable, so the result for each string is kept
+    and rules sharing an interval parse it once per process.
     """
     string = string.strip()
 
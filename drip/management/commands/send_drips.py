@@ -1,9 +1,143 @@
-from django.core.management.base import BaseCommand
+import multiprocessing
 
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from drip.metrics import get_collector
 from drip.models import Drip
 
 
+def shard_type(value: str) -> tuple:
+    """Parse an ``INDEX/COUNT`` shard, e.g. ``0/4``."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise CommandError(
+            'Shard `{value}` is not in the INDEX/COUNT form.'.format(
+                value=value,
+            )
+        )
+    if not 0 <= index < count:
+        raise CommandError(
+            'Shard index must be between 0 and {last}.'.format(
+                last=count - 1,
+            )
+        )
+    return index, count
+
+
+def send_shard(shard: tuple, drips: list = None,
+               unscheduled: bool = False, verbosity: int = 1) -> None:
+    call_command(
+        'send_drips',
+        shard='{index}/{count}'.format(index=shard[0], count=shard[1]),
+        drips=drips,
+        unscheduled=unscheduled,
+        verbosity=verbosity,
+    )
+
+
 class Command(BaseCommand):
+    help = 'Send the enabled drips.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shard',
+            metavar='INDEX/COUNT',
+            help=(
+                'Only send to the users of shard INDEX out of COUNT, '
+                'so COUNT processes or machines can split the drips.'
+            ),
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Fork this many processes, each sending one shard.',
+        )
+        parser.add_argument(
+            '--drip',
+            dest='drips',
+            metavar='ID',
+            type=int,
+            action='append',
+            help='Only send the drip with this id, can be repeated.',
+        )
+        parser.add_argument(
+            '--unscheduled',
+            action='store_true',
+            help='Only send the drips without a schedule of their own.',
+        )
+
     def handle(self, *args, **options):
-        for drip in Drip.objects.filter(enabled=True):
-            drip.drip.run()
+        self.verbosity = options['verbosity']
+        processes = options['processes']
+        if processes > 1:
+            if options['shard']:
+                raise CommandError(
+                    '--shard and --processes can not be used together.'
+                )
+            return self.fork_shards(processes, options)
+
+        shard = shard_type(options['shard']) if options['shard'] else None
+        drips = Drip.objects.filter(
+            enabled=True,
+        ).prefetch_related('queryset_rules')
+        if options['drips']:
+            drips = drips.filter(id__in=options['drips'])
+        if options['unscheduled']:
+            drips = drips.filter(schedule_cron='', schedule_interval='')
+        for drip in drips:
+            drip_base = drip.drip
+            drip_base.shard = shard
+            if drip_base.run() is not None:
+                self.write_summary(drip, drip_base.stats)
+                get_collector().export()
+
+    def write_summary(self, drip, stats) -> None:
+        if self.verbosity < 1:
+            return
+        self.stdout.write(
+            '{drip}: sent {sent}, {failures} failed, in {duration:.2f}s '
+            '({timings})'.format(
+                drip=drip.name,
+                sent=stats.sent,
+                failures=stats.failures,
+                duration=stats.duration,
+                timings=', '.join(
+                    '{phase} {seconds:.2f}s'.format(
+                        phase=phase, seconds=seconds,
+                    )
+                    for phase, seconds in stats.timings.items()
+                ),
+            )
+        )
+
+    def fork_shards(self, processes: int, options: dict) -> None:
+        # every child opens its own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [
+            context.Process(target=send_shard, args=(
+                (index, processes), options['drips'], options['unscheduled'],
+                options['verbosity'],
+            ))
+            for index in range(processes)
+        ]
+        for child in children:
+            child.start()
+        for child in children:
+            child.join()
+
+        failed = [
+            str(index) for index, child in enumerate(children)
+            if child.exitcode != 0
+        ]
+        if failed:
+            raise CommandError(
+                'Shards {failed} of {count} failed.'.format(
+                    failed=', '.join(failed),
+                    count=processes,
+                )
+            )
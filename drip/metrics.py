@@ -0,0 +1,278 @@
+import os
+import threading
+from importlib import import_module
+
+from django.conf import settings
+
+#: the type and help text of every metric of the send path
+METRICS = {
+    'drip_messages_rendered_total': (
+        'counter', 'Messages rendered.',
+    ),
+    'drip_messages_sent_total': (
+        'counter', 'Messages sent.',
+    ),
+    'drip_messages_failed_total': (
+        'counter', 'Messages that failed to render or to send.',
+    ),
+    'drip_query_seconds': (
+        'histogram', 'Time to fetch a chunk of the audience.',
+    ),
+    'drip_prune_seconds': (
+        'histogram', 'Time to prune the audience of a run.',
+    ),
+    'drip_render_seconds': (
+        'histogram', 'Time to render a message.',
+    ),
+    'drip_send_seconds': (
+        'histogram', 'Time to send a message.',
+    ),
+    'drip_persist_seconds': (
+        'histogram', 'Time to write a batch of sent drips.',
+    ),
+    'drip_db_queries': (
+        'histogram', 'Database queries of a drip run.',
+    ),
+}
+
+#: histogram buckets, the upper bound of each
+DEFAULT_BUCKETS = (
+    .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10,
+)
+BUCKETS = {
+    'drip_db_queries': (1, 5, 10, 50, 100, 500, 1000, 5000, 10000),
+}
+
+
+def metrics_collector() -> str:
+    """Dotted path of the collector the send path reports metrics to.
+
+    :return: the ``DRIP_METRICS_COLLECTOR`` setting, defaults to None,
+        which reports nothing
+    :rtype: str
+    """
+    return getattr(settings, 'DRIP_METRICS_COLLECTOR', None)
+
+
+def metrics_textfile() -> str:
+    """File the Prometheus collector exports its metrics to.
+
+    A ``{pid}`` in the path is replaced by the id of the process, so
+    processes sending at once don't overwrite each other's file.
+
+    :return: the ``DRIP_METRICS_TEXTFILE`` setting, defaults to None
+    :rtype: str
+    """
+    return getattr(settings, 'DRIP_METRICS_TEXTFILE', None)
+
+
+def get_labels_key(labels: dict) -> tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+class MetricsCollector(object):
+    """
+    Receives the metrics of the send path.
+
+    Counters only go up, by ``increment``. Histograms get one value per
+    ``observe``, e.g. the seconds a message took to send. Both are told
+    apart by their names, see ``METRICS``, and by their labels.
+    """
+    #: whether metrics that are costly to measure are reported
+    enabled = True
+
+    def increment(self, name: str, value: float = 1,
+                  labels: dict = None) -> None:
+        raise NotImplementedError
+
+    def observe(self, name: str, value: float,
+                labels: dict = None) -> None:
+        raise NotImplementedError
+
+    def export(self) -> None:
+        """Called by ``send_drips`` after every drip run."""
+
+
+class NullCollector(MetricsCollector):
+    """Drops every metric, the default."""
+    enabled = False
+
+    def increment(self, name: str, value: float = 1,
+                  labels: dict = None) -> None:
+        pass
+
+    def observe(self, name: str, value: float,
+                labels: dict = None) -> None:
+        pass
+
+
+class InMemoryCollector(MetricsCollector):
+    """
+    Keeps every counter and every observed value, for tests.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters = {}
+            self.observations = {}
+
+    def increment(self, name: str, value: float = 1,
+                  labels: dict = None) -> None:
+        key = (name, get_labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float,
+                labels: dict = None) -> None:
+        key = (name, get_labels_key(labels))
+        with self.lock:
+            self.observations.setdefault(key, []).append(value)
+
+    def get_counter(self, name: str, **labels) -> float:
+        return self.counters.get((name, get_labels_key(labels)), 0)
+
+    def get_observations(self, name: str, **labels) -> list:
+        return self.observations.get((name, get_labels_key(labels)), [])
+
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{{{labels}}}'.format(labels=','.join(
+        '{name}="{value}"'.format(
+            name=name,
+            value=str(value).replace('\\', '\\\\').replace(
+                '"', '\\"',
+            ).replace('\n', '\\n'),
+        )
+        for name, value in labels
+    ))
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PrometheusCollector(MetricsCollector):
+    """
+    Aggregates the metrics into counters and histograms, and exports
+    them in the Prometheus text format to ``DRIP_METRICS_TEXTFILE``,
+    for the textfile collector of the node exporter.
+
+    Metrics add up over the drips sent by the process, the file is
+    replaced at once after every run.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.counters = {}
+        # (name, labels) -> [bucket counts, sum, count]
+        self.histograms = {}
+
+    def increment(self, name: str, value: float = 1,
+                  labels: dict = None) -> None:
+        key = (name, get_labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float,
+                labels: dict = None) -> None:
+        key = (name, get_labels_key(labels))
+        buckets = BUCKETS.get(name, DEFAULT_BUCKETS)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = [[0] * len(buckets), 0, 0]
+                self.histograms[key] = histogram
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def get_samples(self) -> dict:
+        """The samples of every metric, by name."""
+        samples = {}
+        with self.lock:
+            for (name, labels), value in self.counters.items():
+                samples.setdefault(name, []).append(
+                    (name, labels, value),
+                )
+            for (name, labels), histogram in self.histograms.items():
+                counts, total, count = histogram
+                buckets = BUCKETS.get(name, DEFAULT_BUCKETS)
+                lines = samples.setdefault(name, [])
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append((
+                        name + '_bucket',
+                        labels + (('le', format_value(float(bound))),),
+                        bucket_count,
+                    ))
+                lines.append((
+                    name + '_bucket', labels + (('le', '+Inf'),), count,
+                ))
+                lines.append((name + '_sum', labels, total))
+                lines.append((name + '_count', labels, count))
+        return samples
+
+    def render(self) -> str:
+        lines = []
+        for name, samples in sorted(self.get_samples().items()):
+            kind, help_text = METRICS.get(name, ('untyped', name))
+            lines.append('# HELP {name} {help}'.format(
+                name=name, help=help_text,
+            ))
+            lines.append('# TYPE {name} {kind}'.format(
+                name=name, kind=kind,
+            ))
+            for sample, labels, value in samples:
+                lines.append('{sample}{labels} {value}'.format(
+                    sample=sample,
+                    labels=format_labels(labels),
+                    value=format_value(value),
+                ))
+        return '\n'.join(lines) + '\n'
+
+    def export(self) -> None:
+        path = self.path or metrics_textfile()
+        if not path:
+            return
+        path = path.format(pid=os.getpid())
+        # scrapes never read a partly written file
+        temporary = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+        with open(temporary, 'w') as textfile:
+            textfile.write(self.render())
+        os.replace(temporary, path)
+
+
+NULL_COLLECTOR = NullCollector()
+
+#: a collector per dotted path, so metrics add up over drip runs
+collectors = {}
+collectors_lock = threading.Lock()
+
+
+def get_collector() -> MetricsCollector:
+    """The collector of ``DRIP_METRICS_COLLECTOR``, created once per
+    process.
+    """
+    path = metrics_collector()
+    if not path:
+        return NULL_COLLECTOR
+    collector = collectors.get(path)
+    if collector is None:
+        with collectors_lock:
+            collector = collectors.get(path)
+            if collector is None:
+                mod_name, klass_name = path.rsplit('.', 1)
+                klass = getattr(import_module(mod_name), klass_name)
+                collector = klass()
+                collectors[path] = collector
+    return collector
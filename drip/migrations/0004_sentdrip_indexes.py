@@ -0,0 +1,21 @@
+# Generated by Django 3.1.7 on 2026-10-16 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drip', '0003_testuseruuidmodel'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sentdrip',
+            index=models.Index(fields=['drip', 'user', 'date'], name='drip_sentdr_drip_id_761e15_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentdrip',
+            index=models.Index(fields=['user', 'date'], name='drip_sentdr_user_id_339a76_idx'),
+        ),
+    ]
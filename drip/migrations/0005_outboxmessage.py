@@ -0,0 +1,39 @@
+# Generated by Django 3.1.7 on 2026-10-16 21:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('drip', '0004_sentdrip_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('claimed', 'Claimed'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=8)),
+                ('claimed_by', models.CharField(blank=True, max_length=32, null=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('drip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_messages', to='drip.drip')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='drip_outbox_messages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(fields=['drip', 'status'], name='drip_outbox_drip_id_068248_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='outboxmessage',
+            unique_together={('drip', 'user')},
+        ),
+    ]
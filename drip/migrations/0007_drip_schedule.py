@@ -0,0 +1,23 @@
+# Generated by Django 3.1.7 on 2026-10-16 21:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drip', '0006_schedulerlease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drip',
+            name='schedule_cron',
+            field=models.CharField(blank=True, default='', help_text='Send this drip on its own crontab schedule, e.g. `0 9 * * mon-fri`.', max_length=120),
+        ),
+        migrations.AddField(
+            model_name='drip',
+            name='schedule_interval',
+            field=models.CharField(blank=True, default='', help_text='Or send it at a fixed interval, e.g. `6 hours`.', max_length=60),
+        ),
+    ]
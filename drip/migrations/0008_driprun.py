@@ -0,0 +1,39 @@
+# Generated by Django 3.1.7 on 2026-10-16 21:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drip', '0007_drip_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DripRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('audience', models.PositiveIntegerField(blank=True, help_text='Users matching the drip rules.', null=True)),
+                ('pruned', models.PositiveIntegerField(blank=True, help_text='Users skipped because they already got the drip.', null=True)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('failures', models.PositiveIntegerField(default=0, help_text='Messages that failed to render or to send.')),
+                ('query_time', models.FloatField(default=0)),
+                ('prune_time', models.FloatField(default=0)),
+                ('render_time', models.FloatField(default=0)),
+                ('send_time', models.FloatField(default=0)),
+                ('persist_time', models.FloatField(default=0)),
+                ('drip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='drip.drip')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='driprun',
+            index=models.Index(fields=['drip', 'started_at'], name='drip_dripru_drip_id_af9871_idx'),
+        ),
+    ]
@@ -47,10 +47,43 @@ class AbstractDrip(models.Model):
     message_class = models.CharField(
         max_length=120, blank=True, default='default'
     )
+    schedule_cron = models.CharField(
+        max_length=120,
+        blank=True,
+        default='',
+        help_text=(
+            'Send this drip on its own crontab schedule, '
+            'e.g. `0 9 * * mon-fri`.'
+        ),
+    )
+    schedule_interval = models.CharField(
+        max_length=60,
+        blank=True,
+        default='',
+        help_text='Or send it at a fixed interval, e.g. `6 hours`.',
+    )
 
     class Meta:
         abstract = True
 
+    @property
+    def has_schedule(self) -> bool:
+        return bool(self.schedule_cron or self.schedule_interval)
+
+    def clean(self) -> None:
+        from drip.scheduler.triggers import get_schedule_trigger
+
+        if self.schedule_cron and self.schedule_interval:
+            raise ValidationError(
+                'Set either a crontab schedule or an interval, not both.'
+            )
+        try:
+            get_schedule_trigger(self)
+        except (TypeError, ValueError) as e:
+            raise ValidationError(
+                'Invalid schedule: {error}'.format(error=e)
+            )
+
     @property
     def drip(self):
         from drip.drips import DripBase
@@ -112,12 +145,144 @@ class AbstractSentDrip(models.Model):
 
     class Meta:
         abstract = True
+        indexes = [
+            # prune: the users a drip was already sent to
+            models.Index(fields=['drip', 'user', 'date']),
+            # the history of drips sent to a user
+            models.Index(fields=['user', 'date']),
+        ]
 
 
 class SentDrip(AbstractSentDrip):
     pass
 
 
+class AbstractDripRun(models.Model):
+    """
+    The counts and phase timings of a run of a drip.
+
+    Timings are in seconds. Rendering and sending in several threads
+    sum the time of every thread.
+    """
+    drip = models.ForeignKey(
+        'drip.Drip',
+        related_name='runs',
+        on_delete=models.CASCADE,
+    )
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    audience = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text='Users matching the drip rules.',
+    )
+    pruned = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text='Users skipped because they already got the drip.',
+    )
+    sent = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(
+        default=0,
+        help_text='Messages that failed to render or to send.',
+    )
+    query_time = models.FloatField(default=0)
+    prune_time = models.FloatField(default=0)
+    render_time = models.FloatField(default=0)
+    send_time = models.FloatField(default=0)
+    persist_time = models.FloatField(default=0)
+
+    class Meta:
+        abstract = True
+        indexes = [
+            models.Index(fields=['drip', 'started_at']),
+        ]
+
+    @property
+    def duration(self):
+        if self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+    def __str__(self):
+        return '{drip} at {started_at}'.format(
+            drip=self.drip, started_at=self.started_at,
+        )
+
+
+class DripRun(AbstractDripRun):
+    pass
+
+
+OUTBOX_STATUSES = (
+    ('pending', 'Pending'),
+    ('claimed', 'Claimed'),
+    ('sent', 'Sent'),
+    ('failed', 'Failed'),
+)
+
+
+class AbstractOutboxMessage(models.Model):
+    """
+    A user a drip is going to be sent to.
+
+    The audience of a drip is stored as pending rows that the workers
+    sending it claim in batches, so a user is only sent a drip once
+    however many workers run it.
+    """
+    date = models.DateTimeField(auto_now_add=True)
+    drip = models.ForeignKey(
+        'drip.Drip',
+        related_name='outbox_messages',
+        on_delete=models.CASCADE,
+    )
+    user = models.ForeignKey(
+        getattr(settings, 'AUTH_USER_MODEL', 'auth.User'),
+        related_name='drip_outbox_messages',
+        on_delete=models.CASCADE,
+    )
+    status = models.CharField(
+        max_length=8,
+        default='pending',
+        choices=OUTBOX_STATUSES,
+    )
+    claimed_by = models.CharField(max_length=32, null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+        unique_together = [('drip', 'user')]
+        indexes = [
+            models.Index(fields=['drip', 'status']),
+        ]
+
+
+class OutboxMessage(AbstractOutboxMessage):
+    pass
+
+
+class AbstractSchedulerLease(models.Model):
+    """
+    A lease electing the one process allowed to run a scheduled job.
+
+    Every process running the scheduler tries to hold the lease, the
+    holder renews it while it is alive, and another process takes it
+    over once it has expired.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    holder = models.CharField(max_length=255, null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    renewed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.name
+
+
+class SchedulerLease(AbstractSchedulerLease):
+    pass
+
+
 METHOD_TYPES = (
     ('filter', 'Filter'),
     ('exclude', 'Exclude'),
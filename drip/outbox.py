@@ -0,0 +1,223 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+from drip.drips import SentDripWriter, conditional_now
+from drip.models import OutboxMessage
+
+
+def outbox_enabled() -> bool:
+    """Whether drips are sent through the outbox.
+
+    :return: the ``DRIP_USE_OUTBOX`` setting, defaults to False
+    :rtype: bool
+    """
+    return getattr(settings, 'DRIP_USE_OUTBOX', False)
+
+
+def outbox_batch_size() -> int:
+    """Number of outbox messages a worker claims at once.
+
+    :return: the ``DRIP_OUTBOX_BATCH_SIZE`` setting, defaults to 100
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_OUTBOX_BATCH_SIZE', 100)
+
+
+def outbox_claim_timeout() -> int:
+    """Seconds after which messages claimed by a worker that never
+    finished sending them can be claimed again.
+
+    :return: the ``DRIP_OUTBOX_CLAIM_TIMEOUT`` setting, defaults to 3600
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_OUTBOX_CLAIM_TIMEOUT', 3600)
+
+
+class Outbox(object):
+    """
+    Sends a drip through OutboxMessage rows.
+
+    The audience is first stored as pending rows, unique per drip and
+    user. Workers, on as many hosts as needed, then claim batches of
+    pending rows, send them and mark them as sent, so no user is sent
+    the drip twice. A drip with a shard only deals with the rows of
+    the users of its shard. Rows are claimed with ``SELECT ... FOR UPDATE SKIP
+    LOCKED`` where the database supports it, and otherwise with an
+    ``UPDATE`` that only succeeds on rows that are still pending.
+    """
+
+    def __init__(self, drip_base, worker: str = None,
+                 batch_size: int = None):
+        self.drip_base = drip_base
+        self.worker = worker or uuid.uuid4().hex
+        self.batch_size = batch_size or outbox_batch_size()
+
+    @property
+    def drip_model(self):
+        return self.drip_base.drip_model
+
+    def get_messages(self):
+        """The messages of the drip, only those of the users of its
+        shard when it has one, so workers of other shards don't enqueue,
+        drop or claim them.
+        """
+        return self.drip_base.apply_shard(
+            OutboxMessage.objects.filter(drip=self.drip_model),
+            prefix='user',
+        )
+
+    def get_pending(self):
+        return self.get_messages().filter(status='pending')
+
+    def requeue(self) -> int:
+        """Make failed messages, and those claimed by workers that
+        timed out, pending again.
+        """
+        timed_out = conditional_now() - timedelta(
+            seconds=outbox_claim_timeout(),
+        )
+        return self.get_messages().filter(
+            Q(status='failed') |
+            Q(status='claimed', claimed_at__lt=timed_out)
+        ).update(status='pending', claimed_by=None, claimed_at=None)
+
+    def drop_stale(self) -> int:
+        """Delete the pending messages of users who are no longer in
+        the drip queryset, e.g. requeued failures of users who stopped
+        matching its rules since.
+        """
+        audience = self.drip_base.get_queryset().values('pk')
+        deleted, _ = self.get_pending().exclude(user__in=audience).delete()
+        return deleted
+
+    def enqueue(self) -> int:
+        """Store the users of the drip queryset as pending messages.
+
+        Users already in the outbox, whatever their status, are skipped.
+        Pending messages, requeued ones included, of users who left the
+        queryset are dropped, so they don't get the drip.
+        """
+        with self.drip_base.stats.timer('query'):
+            return self.insert_audience()
+
+    def insert_audience(self) -> int:
+        self.requeue()
+        self.drop_stale()
+        count = 0
+        user_ids = self.drip_base.get_queryset().values_list(
+            'pk', flat=True,
+        ).iterator()
+        batch = []
+        for user_id in user_ids:
+            batch.append(
+                OutboxMessage(drip=self.drip_model, user_id=user_id),
+            )
+            if len(batch) >= self.batch_size:
+                count += self.insert(batch)
+                batch = []
+        count += self.insert(batch)
+        return count
+
+    def insert(self, batch: list) -> int:
+        if batch:
+            OutboxMessage.objects.bulk_create(batch, ignore_conflicts=True)
+        return len(batch)
+
+    def claim(self) -> list:
+        """Claim a batch of pending messages for this worker."""
+        with self.drip_base.stats.timer('query'):
+            return self.claim_batch()
+
+    def claim_batch(self) -> list:
+        database = router.db_for_write(OutboxMessage)
+        features = connections[database].features
+        candidates = self.get_pending().order_by('pk')
+        claimed = dict(
+            status='claimed',
+            claimed_by=self.worker,
+            claimed_at=conditional_now(),
+        )
+
+        if features.has_select_for_update_skip_locked:
+            with transaction.atomic(using=database):
+                ids = list(
+                    candidates.select_for_update(
+                        skip_locked=True,
+                    ).values_list('pk', flat=True)[:self.batch_size]
+                )
+                OutboxMessage.objects.filter(pk__in=ids).update(**claimed)
+        else:
+            # the status filter makes the update a no-op on rows another
+            # worker claimed since they were read
+            ids = list(
+                candidates.values_list('pk', flat=True)[:self.batch_size]
+            )
+            self.get_pending().filter(pk__in=ids).update(**claimed)
+
+        claimed = OutboxMessage.objects.filter(
+            pk__in=ids,
+            status='claimed',
+            claimed_by=self.worker,
+        ).select_related('user')
+        claimed = self.drip_base.apply_related(claimed, prefix='user')
+        claimed = list(
+            self.drip_base.apply_audience_columns(claimed, prefix='user')
+        )
+        self.drip_base.prepare_audience(
+            [outbox_message.user for outbox_message in claimed],
+        )
+        return claimed
+
+    def send(self, MessageClass) -> int:
+        """Claim and send pending messages until there are none left.
+
+        Returns the count of messages sent by this worker.
+        """
+        count = 0
+        connection = self.drip_base.open_connection()
+        try:
+            while True:
+                claimed = self.claim()
+                if claimed:
+                    count += self.deliver(connection, MessageClass, claimed)
+                elif not self.get_pending().exists():
+                    break
+        finally:
+            connection.close()
+        return count
+
+    def deliver(self, connection, MessageClass, claimed: list) -> int:
+        message_ids = {}
+        message_instances = []
+        for outbox_message in claimed:
+            message_instance = self.drip_base.build_message(
+                MessageClass, outbox_message.user,
+            )
+            if message_instance is not None:
+                message_ids[id(message_instance)] = outbox_message.pk
+                message_instances.append(message_instance)
+
+        results = self.drip_base.send_messages(connection, message_instances)
+        sent_ids = {
+            message_ids[id(message_instance)]
+            for message_instance, result in results if result
+        }
+        failed_ids = [
+            outbox_message.pk for outbox_message in claimed
+            if outbox_message.pk not in sent_ids
+        ]
+
+        with self.drip_base.stats.timer('persist'), transaction.atomic():
+            with SentDripWriter() as writer:
+                count = self.drip_base.record_results(writer, results)
+            OutboxMessage.objects.filter(pk__in=sent_ids).update(
+                status='sent',
+            )
+            OutboxMessage.objects.filter(pk__in=failed_ids).update(
+                status='failed',
+            )
+        return count
@@ -0,0 +1,72 @@
+from importlib import import_module
+
+from django.conf import settings
+
+
+def configured_context_providers() -> list:
+    """Context providers used by every drip.
+
+    :return: the providers of the ``DRIP_CONTEXT_PROVIDERS`` setting, a
+        list of dotted paths to ``ContextProvider`` subclasses, defaults
+        to none
+    :rtype: list
+    """
+    providers = []
+    for path in getattr(settings, 'DRIP_CONTEXT_PROVIDERS', ()):
+        mod_name, klass_name = path.rsplit('.', 1)
+        klass = getattr(import_module(mod_name), klass_name)
+        providers.append(klass())
+    return providers
+
+
+class ContextProvider(object):
+    """
+    Loads extra template context for a chunk of users at once.
+
+    Drips render messages for chunks of users. Before a chunk is
+    rendered, ``load`` is called once with all of its users, so a
+    provider can fetch whatever its templates need with one query
+    instead of one per user.
+    """
+
+    def load(self, drip_base, users: list) -> dict:
+        """Return a dict of extra context for each user, by user pk.
+
+        Users missing from the result get no extra context.
+        """
+        raise NotImplementedError
+
+
+class ModelContextProvider(ContextProvider):
+    """
+    Puts in the context the instance of ``model`` related to each user.
+
+    For example, with::
+
+        class ProfileProvider(ModelContextProvider):
+            name = 'profile'
+            model = Profile
+
+    templates can use ``{{ profile.credits }}``, and the profiles of a
+    chunk are read with a single query.
+    """
+    #: the name of the instances in the context
+    name = None
+    model = None
+    #: the field of ``model`` pointing to the user
+    user_field = 'user'
+
+    def get_queryset(self):
+        return self.model._default_manager.all()
+
+    def load(self, drip_base, users: list) -> dict:
+        attname = self.model._meta.get_field(self.user_field).attname
+        instances = self.get_queryset().filter(**{
+            '{field}__in'.format(field=self.user_field): [
+                user.pk for user in users
+            ],
+        })
+        return {
+            getattr(instance, attname): {self.name: instance}
+            for instance in instances
+        }
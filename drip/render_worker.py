@@ -0,0 +1,85 @@
+"""
+What the render processes of ``drip.engines.ProcessEngine`` run.
+
+Render processes are spawned, and import this module before Django is
+set up, so nothing here imports models, or ``drip.drips``, at the top.
+"""
+import os
+
+#: ``(key, drip_base)``, the drip of the run being rendered by this
+#: process, built from the state of its first chunk
+worker_drip = None
+
+
+def init_render_process(settings_module: str) -> None:
+    """Set up Django once in each render process."""
+    if settings_module:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def get_drip_state(drip_base) -> tuple:
+    """What a render process needs to build ``drip_base`` again.
+
+    The drip model is sent along, so render processes don't query it.
+    Classes, and context providers, are pickled, so they must be
+    importable.
+    """
+    return (
+        os.urandom(8).hex(),
+        type(drip_base),
+        drip_base.drip_model,
+        dict(
+            name=drip_base.name,
+            from_email=drip_base.from_email,
+            from_email_name=drip_base.from_email_name,
+            subject_template=drip_base.subject_template,
+            body_template=drip_base.body_template,
+            select_related=drip_base.select_related,
+            prefetch_related=drip_base.prefetch_related,
+            context_providers=drip_base.context_providers,
+            now_shift_kwargs=drip_base.now_shift_kwargs,
+            shard=drip_base.shard,
+        ),
+    )
+
+
+def build_drip(drip_state: tuple):
+    """The drip of ``drip_state``, built once per process and run."""
+    global worker_drip
+    key, DripClass, drip_model, kwargs = drip_state
+    if worker_drip is None or worker_drip[0] != key:
+        worker_drip = (key, DripClass(drip_model=drip_model, **kwargs))
+    return worker_drip[1]
+
+
+def get_users(drip_base, UserModel, user_ids: list) -> dict:
+    """The users with ``user_ids``, with the columns and relations
+    messages read, by primary key.
+    """
+    return drip_base.apply_audience_columns(
+        drip_base.apply_related(UserModel._default_manager.all()),
+    ).in_bulk(user_ids)
+
+
+def render_chunk(drip_state: tuple, UserModel, MessageClass,
+                 user_ids: list) -> dict:
+    """Render, in a render process, the messages of a chunk of users.
+
+    :return: the subject, body and plain body of every message rendered,
+        by user primary key
+    :rtype: dict
+    """
+    drip_base = build_drip(drip_state)
+    users = get_users(drip_base, UserModel, user_ids)
+    rendered = {}
+    for user in drip_base.prepare_audience(list(users.values())):
+        message_instance = drip_base.build_message(MessageClass, user)
+        if message_instance is not None:
+            rendered[user.pk] = (
+                message_instance.subject,
+                message_instance.body,
+                message_instance.plain,
+            )
+    return rendered
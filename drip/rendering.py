@@ -0,0 +1,204 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.template import Context, Template
+from django.template.base import (
+    Lexer,
+    TextNode,
+    TokenType,
+    Variable,
+    VariableNode,
+)
+from django.template.defaulttags import CommentNode, LoadNode
+from django.utils.html import strip_tags
+
+
+def template_cache_size() -> int:
+    """Number of compiled templates kept by the process wide cache.
+
+    :return: the ``DRIP_TEMPLATE_CACHE_SIZE`` setting, defaults to 256
+    :rtype: int
+    """
+    return getattr(settings, 'DRIP_TEMPLATE_CACHE_SIZE', 256)
+
+
+# built in tags that only read the variables named in them
+CONTEXT_SAFE_TAGS = frozenset((
+    'autoescape', 'endautoescape', 'comment', 'endcomment', 'cycle',
+    'filter', 'endfilter', 'firstof', 'for', 'empty', 'endfor', 'if',
+    'elif', 'else', 'endif', 'now', 'spaceless', 'endspaceless',
+    'templatetag', 'verbatim', 'endverbatim', 'widthratio', 'with',
+    'endwith',
+))
+
+USER_LOOKUP = re.compile(r'(?<![\w.])user\b((?:\.\w+)*)')
+
+
+def find_user_lookups(source: str):
+    """Attribute paths read on ``user`` by the template ``source``.
+
+    ``{{ user.profile.city|title }}`` reads ``('profile', 'city')``.
+    Returns None when the template may read the user in ways that can't
+    be told from its source: the bare ``{{ user }}``, a filter or tag
+    given the whole user, or any tag that isn't a built in one only
+    reading the variables it names.
+    """
+    lookups = set()
+    for token in Lexer(source).tokenize():
+        if token.token_type == TokenType.BLOCK:
+            if token.contents.split()[0] not in CONTEXT_SAFE_TAGS:
+                return None
+        elif token.token_type != TokenType.VAR:
+            continue
+        for match in USER_LOOKUP.finditer(token.contents):
+            path = tuple(match.group(1).split('.')[1:])
+            if not path:
+                return None
+            lookups.add(path)
+    return lookups
+
+
+def is_static_variable(variable) -> bool:
+    # constants are resolved when the template is compiled, variables
+    # with lookups read the context and translations the active language
+    if not isinstance(variable, Variable):
+        return True
+    return variable.lookups is None and not variable.translate
+
+
+def is_static_node(node) -> bool:
+    """Whether ``node`` renders the same output whatever the context.
+
+    Text, comments and ``{% load %}`` are static, and so are variables
+    built from constants only, such as ``{{ "Hi"|upper }}``. Any other
+    tag, or a variable reading the context like ``{{ user.username }}``,
+    has to be rendered for every message.
+    """
+    if isinstance(node, (TextNode, CommentNode, LoadNode)):
+        return True
+    if isinstance(node, VariableNode):
+        expression = node.filter_expression
+        return is_static_variable(expression.var) and all(
+            not lookup or is_static_variable(arg)
+            for func, args in expression.filters
+            for lookup, arg in args
+        )
+    return False
+
+
+class DripTemplate(object):
+    """
+    A compiled template whose context independent parts are rendered
+    once.
+
+    Consecutive static top level nodes are rendered when the template
+    is compiled and replaced by a single text node. When every node is
+    static, the template is rendered, and its tags stripped, once and
+    the result is shared by every message.
+    """
+
+    def __init__(self, source: str):
+        self.template = Template(source)
+        self.static = all(
+            is_static_node(node) for node in self.template.nodelist
+        )
+        self._rendered = None
+        self._plain = None
+        self.user_lookups = find_user_lookups(self.template.source)
+        if not self.static:
+            self.fold_static_nodes()
+
+    def fold_static_nodes(self) -> None:
+        nodelist = self.template.nodelist
+        context = Context()
+        folded = nodelist.__class__()
+        static = []
+        for node in nodelist:
+            if is_static_node(node):
+                static.append(node.render_annotated(context))
+                continue
+            if static:
+                folded.append(TextNode(''.join(static)))
+                static = []
+            folded.append(node)
+        if static:
+            folded.append(TextNode(''.join(static)))
+        self.template.nodelist = folded
+
+    def render(self, context) -> str:
+        if not self.static:
+            return self.template.render(context)
+        if self._rendered is None:
+            self._rendered = self.template.render(context)
+        return self._rendered
+
+    def render_plain(self, context) -> str:
+        """The rendered template without its tags."""
+        if not self.static:
+            return strip_tags(self.template.render(context))
+        if self._plain is None:
+            self._plain = strip_tags(self.render(context))
+        return self._plain
+
+
+class TemplateCache(object):
+    """
+    Least recently used cache of compiled templates.
+
+    Entries are keyed by drip id, the drip's ``lastchanged`` and a hash
+    of the template source, so editing a drip never serves a stale
+    template and templates are lexed and parsed once per process
+    instead of once per message.
+    """
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size
+        self.templates = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.templates)
+
+    def get_max_size(self) -> int:
+        return self.max_size or template_cache_size()
+
+    def get_key(self, source: str, drip_model=None) -> tuple:
+        digest = hashlib.sha1(str(source).encode('utf-8')).hexdigest()
+        return (
+            getattr(drip_model, 'pk', None),
+            getattr(drip_model, 'lastchanged', None),
+            digest,
+        )
+
+    def get(self, source: str, drip_model=None) -> DripTemplate:
+        key = self.get_key(source, drip_model)
+        with self.lock:
+            template = self.templates.get(key)
+            if template is not None:
+                self.templates.move_to_end(key)
+                return template
+
+        template = DripTemplate(source)
+
+        with self.lock:
+            self.templates[key] = template
+            while len(self.templates) > self.get_max_size():
+                self.templates.popitem(last=False)
+        return template
+
+    def clear(self) -> None:
+        with self.lock:
+            self.templates.clear()
+
+
+template_cache = TemplateCache()
+
+
+def get_template(source: str, drip_model=None) -> DripTemplate:
+    """Compiled template for ``source``, parsed at most once while it
+    stays in the cache.
+    """
+    return template_cache.get(source, drip_model)
@@ -1,7 +1,16 @@
+import atexit
+import logging
+
 from django.conf import settings
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from django.core.management import call_command
+from django.db import DatabaseError, close_old_connections
+
+from drip.drips import conditional_now
+from drip.models import Drip
+from drip.scheduler.lease import Lease
+from drip.scheduler.triggers import OffsetTrigger, get_schedule_trigger
 
 
 DRIP_SCHEDULE_SETTINGS = getattr(
@@ -21,11 +30,154 @@ DRIP_SCHEDULE_HOUR = DRIP_SCHEDULE_SETTINGS.get(
 DRIP_SCHEDULE_MINUTE = DRIP_SCHEDULE_SETTINGS.get(
     'DRIP_SCHEDULE_MINUTE', 0
 )
+DRIP_SCHEDULE_LEASE_DURATION = DRIP_SCHEDULE_SETTINGS.get(
+    'DRIP_SCHEDULE_LEASE_DURATION', 60
+)
+DRIP_SCHEDULE_STAGGER = DRIP_SCHEDULE_SETTINGS.get(
+    'DRIP_SCHEDULE_STAGGER', 0
+)
+DRIP_SCHEDULE_JITTER = DRIP_SCHEDULE_SETTINGS.get(
+    'DRIP_SCHEDULE_JITTER', None
+)
+DRIP_SCHEDULE_REFRESH = DRIP_SCHEDULE_SETTINGS.get(
+    'DRIP_SCHEDULE_REFRESH', 300
+)
+
+#: the name of the lease electing the process sending drips
+LEASE_NAME = 'send_drips'
+
+
+def holds_lease(lease) -> bool:
+    """Take or renew ``lease`` from a job of the scheduler.
+
+    Scheduler threads outlive their jobs, so the connections they
+    opened are closed first if they broke or grew too old, e.g. after a
+    database restart. A database error means the lease isn't held.
+    """
+    close_old_connections()
+    try:
+        return lease.acquire()
+    except DatabaseError as e:
+        logging.error(
+            "Failed to acquire the {name} lease: {err}".format(
+                name=lease.name, err=str(e),
+            )
+        )
+        return False
+    finally:
+        close_old_connections()
+
+
+def send_drips(**options) -> None:
+    """Run ``send_drips`` from a job of the scheduler."""
+    close_old_connections()
+    try:
+        call_command('send_drips', **options)
+    finally:
+        close_old_connections()
+
+
+class DripJobs(object):
+    """
+    Keeps a job on the scheduler for every enabled drip with a schedule
+    of its own.
+
+    The drips are spread evenly over ``stagger`` seconds: the n-th of
+    them starts ``stagger * n / count`` seconds after its schedule, so
+    drips sharing a schedule don't all hit the database and the mail
+    server at once. ``jitter`` adds a random delay of up to that many
+    seconds on top. Jobs coalesce missed runs and never run twice at
+    once, a drip still sending when its next run is due skips it.
+    """
+
+    def __init__(self, scheduler, lease, stagger: int = 0,
+                 jitter: int = None, timezone: str = None):
+        self.scheduler = scheduler
+        self.lease = lease
+        self.stagger = stagger
+        self.jitter = jitter
+        self.timezone = timezone
+        # job id -> the schedule it was added with
+        self.schedules = {}
+
+    def get_drips(self):
+        return Drip.objects.filter(enabled=True).exclude(
+            schedule_cron='', schedule_interval='',
+        ).only('id', 'schedule_cron', 'schedule_interval').order_by('id')
+
+    def send(self, drip_id: int) -> None:
+        if holds_lease(self.lease):
+            send_drips(drips=[drip_id])
+
+    def add_job(self, job_id: str, drip, offset: float) -> bool:
+        try:
+            trigger = get_schedule_trigger(
+                drip, timezone=self.timezone, jitter=self.jitter,
+            )
+        except (TypeError, ValueError) as e:
+            logging.error(
+                "Invalid schedule for drip {drip}: {err}".format(
+                    drip=drip.id, err=str(e),
+                )
+            )
+            return False
+        if offset:
+            trigger = OffsetTrigger(trigger, offset)
+        self.scheduler.add_job(
+            self.send,
+            trigger,
+            args=(drip.id,),
+            id=job_id,
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1,
+        )
+        return True
+
+    def sync(self) -> None:
+        """Add, replace and remove jobs after the drips changed."""
+        close_old_connections()
+        try:
+            drips = list(self.get_drips())
+        finally:
+            close_old_connections()
+        schedules = {}
+        for index, drip in enumerate(drips):
+            job_id = 'drip_{id}'.format(id=drip.id)
+            offset = self.stagger * index / len(drips)
+            schedule = (drip.schedule_cron, drip.schedule_interval, offset)
+            if self.schedules.get(job_id) == schedule:
+                schedules[job_id] = schedule
+            elif self.add_job(job_id, drip, offset):
+                schedules[job_id] = schedule
+        for job_id in set(self.schedules) - set(schedules):
+            if self.scheduler.get_job(job_id) is not None:
+                self.scheduler.remove_job(job_id)
+        self.schedules = schedules
 
 
 def cron_send_drips():
+    """Send drips on the configured schedule.
+
+    Every process calling this starts a scheduler, but only the one
+    holding the ``send_drips`` lease runs the command on each tick. The
+    leader renews the lease every third of
+    ``DRIP_SCHEDULE_LEASE_DURATION`` seconds, even while sending, and
+    when it stops doing so another process takes over.
+
+    Drips without a schedule of their own are sent together on the
+    ``DRIP_SCHEDULE_*`` schedule, the others each on theirs. Schedule
+    changes are picked up every ``DRIP_SCHEDULE_REFRESH`` seconds.
+    """
+    lease = Lease(LEASE_NAME, DRIP_SCHEDULE_LEASE_DURATION)
+    timezone = getattr(settings, 'TIME_ZONE', 'UTC')
+
+    def renew_lease():
+        holds_lease(lease)
+
     def call_send_drips_command():
-        call_command('send_drips')
+        if holds_lease(lease):
+            send_drips(unscheduled=True)
 
     if DRIP_SCHEDULE:
         cron_scheduler = BackgroundScheduler()
@@ -35,6 +187,31 @@ def cron_send_drips():
             day_of_week=DRIP_SCHEDULE_DAY_OF_WEEK,
             hour=DRIP_SCHEDULE_HOUR,
             minute=DRIP_SCHEDULE_MINUTE,
-            timezone=getattr(settings, 'TIME_ZONE', 'UTC'),
+            timezone=timezone,
+            coalesce=True,
+            max_instances=1,
+        )
+        drip_jobs = DripJobs(
+            cron_scheduler,
+            lease,
+            stagger=DRIP_SCHEDULE_STAGGER,
+            jitter=DRIP_SCHEDULE_JITTER,
+            timezone=timezone,
+        )
+        # the first sync runs at once, in the scheduler's thread
+        cron_scheduler.add_job(
+            drip_jobs.sync,
+            'interval',
+            seconds=DRIP_SCHEDULE_REFRESH,
+            next_run_time=conditional_now(),
+            coalesce=True,
+            max_instances=1,
+        )
+        cron_scheduler.add_job(
+            renew_lease,
+            'interval',
+            seconds=max(DRIP_SCHEDULE_LEASE_DURATION / 3, 1),
         )
         cron_scheduler.start()
+        atexit.register(lease.release)
+        return cron_scheduler
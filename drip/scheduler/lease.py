@@ -0,0 +1,80 @@
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from drip.drips import conditional_now
+from drip.models import SchedulerLease
+
+
+def default_holder() -> str:
+    """Identifies this process among the ones running the scheduler."""
+    return '{host}:{pid}:{token}'.format(
+        host=socket.gethostname(),
+        pid=os.getpid(),
+        token=uuid.uuid4().hex[:8],
+    )
+
+
+class Lease(object):
+    """
+    Leader election through a ``SchedulerLease`` row.
+
+    ``acquire`` takes the lease when nobody holds it or its holder let
+    it expire, and renews it when this process already holds it. Both
+    are a single conditional ``UPDATE``, so when several processes try
+    at once only one of them gets the lease. The holder has to renew it
+    more often than every ``duration`` seconds, otherwise another
+    process takes it over.
+
+    Expiry dates come from the clocks of the processes, which have to
+    agree to well under ``duration``.
+    """
+
+    def __init__(self, name: str, duration: int, holder: str = None):
+        self.name = name
+        self.duration = duration
+        self.holder = holder or default_holder()
+
+    def get_leases(self):
+        return SchedulerLease.objects.filter(name=self.name)
+
+    def create(self) -> None:
+        try:
+            with transaction.atomic():
+                SchedulerLease.objects.create(name=self.name)
+        except IntegrityError:
+            # created by another process meanwhile
+            pass
+
+    def acquire(self) -> bool:
+        """Take or renew the lease, returns whether this process holds
+        it.
+        """
+        now = conditional_now()
+        claimable = self.get_leases().filter(
+            Q(holder=self.holder) |
+            Q(holder__isnull=True) |
+            Q(expires_at__isnull=True) |
+            Q(expires_at__lte=now)
+        )
+        lease = dict(
+            holder=self.holder,
+            expires_at=now + timedelta(seconds=self.duration),
+            renewed_at=now,
+        )
+        if claimable.update(**lease):
+            return True
+        if not self.get_leases().exists():
+            self.create()
+            return bool(claimable.update(**lease))
+        return False
+
+    def release(self) -> None:
+        """Give the lease up, so another process can take it at once."""
+        self.get_leases().filter(holder=self.holder).update(
+            holder=None, expires_at=None,
+        )
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from drip.helpers import parse
+
+
+def get_schedule_trigger(drip_model, timezone: str = None,
+                         jitter: int = None):
+    """The trigger firing on the schedule of ``drip_model``, or None
+    when the drip has no schedule of its own.
+
+    :raises ValueError: for an invalid crontab expression or interval
+    :raises TypeError: for an interval that can't be parsed
+    """
+    if drip_model.schedule_cron:
+        values = drip_model.schedule_cron.split()
+        if len(values) != 5:
+            raise ValueError(
+                'wrong number of crontab fields, expected 5'
+            )
+        minute, hour, day, month, day_of_week = values
+        return CronTrigger(
+            minute=minute,
+            hour=hour,
+            day=day,
+            month=month,
+            day_of_week=day_of_week,
+            timezone=timezone,
+            jitter=jitter,
+        )
+    if drip_model.schedule_interval:
+        interval = parse(drip_model.schedule_interval)
+        if interval <= timedelta(0):
+            raise ValueError('the interval must be positive')
+        return IntervalTrigger(
+            seconds=interval.total_seconds(),
+            timezone=timezone,
+            jitter=jitter,
+        )
+    return None
+
+
+class OffsetTrigger(BaseTrigger):
+    """
+    Fires ``offset`` seconds after every fire time of ``trigger``.
+
+    Drips sharing a schedule would all start at once, shifting each of
+    them by a different offset spreads their runs over a window.
+    """
+
+    def __init__(self, trigger, offset: float):
+        self.trigger = trigger
+        self.offset = timedelta(seconds=offset)
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        if previous_fire_time is not None:
+            previous_fire_time -= self.offset
+        fire_time = self.trigger.get_next_fire_time(
+            previous_fire_time, now - self.offset,
+        )
+        if fire_time is None:
+            return None
+        return fire_time + self.offset
+
+    def __str__(self):
+        return '{trigger} + {offset}'.format(
+            trigger=self.trigger, offset=self.offset,
+        )
+
+    def __repr__(self):
+        return '<OffsetTrigger ({trigger!r}, offset={offset!r})>'.format(
+            trigger=self.trigger, offset=self.offset.total_seconds(),
+        )
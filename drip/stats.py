@@ -0,0 +1,108 @@
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.db import connection
+
+from drip.metrics import NULL_COLLECTOR
+
+#: the phases of a drip run that are timed
+PHASES = ('query', 'prune', 'render', 'send', 'persist')
+
+
+class RunStats(object):
+    """
+    Counts and phase timings of a drip run.
+
+    Engines render and send from several threads at once, so timings
+    are summed over every thread: with workers, a phase can take longer
+    than the run itself.
+
+    Everything is also reported to ``collector``, with ``labels``: each
+    timed block as an observation of ``drip_<phase>_seconds``, and the
+    messages rendered, sent and failed as counters. See
+    ``drip.metrics``.
+    """
+
+    def __init__(self, collector=None, labels: dict = None):
+        self.collector = collector or NULL_COLLECTOR
+        self.labels = labels or {}
+        self.started_at = None
+        self.finished_at = None
+        self.audience = None
+        self.pruned = None
+        self.rendered = 0
+        self.sent = 0
+        self.failures = 0
+        self.queries = None
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.lock = threading.Lock()
+
+    @property
+    def duration(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        with self.lock:
+            self.timings[phase] += seconds
+
+    def add_rendered(self, count: int = 1) -> None:
+        with self.lock:
+            self.rendered += count
+        self.collector.increment(
+            'drip_messages_rendered_total', count, self.labels,
+        )
+
+    def add_results(self, sent: int, failures: int = 0) -> None:
+        with self.lock:
+            self.sent += sent
+            self.failures += failures
+        if sent:
+            self.collector.increment(
+                'drip_messages_sent_total', sent, self.labels,
+            )
+        if failures:
+            self.collector.increment(
+                'drip_messages_failed_total', failures, self.labels,
+            )
+
+    @contextmanager
+    def timer(self, phase: str):
+        """Add the time spent in the block to ``phase``."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - start
+            self.add_time(phase, seconds)
+            self.collector.observe(
+                'drip_{phase}_seconds'.format(phase=phase),
+                seconds,
+                self.labels,
+            )
+
+    @contextmanager
+    def count_queries(self):
+        """Count the database queries of the block, made from the
+        calling thread, when the collector is enabled.
+        """
+        if not self.collector.enabled:
+            yield
+            return
+
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        try:
+            with connection.execute_wrapper(count):
+                yield
+        finally:
+            self.queries = queries[0]
+            self.collector.observe(
+                'drip_db_queries', self.queries, self.labels,
+            )
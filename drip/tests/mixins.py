@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from drip.models import Drip, QuerySetRule
+from drip.utils import get_user_model
+
+
+class AudienceMixin(object):
+    """
+    Creates ``user_count`` users, ``user_<i>`` with the email
+    ``user_<i>@test.com``, and ``model_drip``, the "Everybody" drip
+    whose rule matches all of them.
+    """
+    user_count = 5
+    body_html_template = 'KETTEHS ROCK!'
+
+    def setUp(self):
+        super(AudienceMixin, self).setUp()
+        self.User = get_user_model()
+        for i in range(self.user_count):
+            self.User.objects.create(
+                username='user_{i}'.format(i=i),
+                email='user_{i}@test.com'.format(i=i),
+            )
+        self.model_drip = Drip.objects.create(
+            name='Everybody',
+            enabled=True,
+            subject_template='HELLO {{ user.username }}',
+            body_html_template=self.body_html_template,
+        )
+        QuerySetRule.objects.create(
+            drip=self.model_drip,
+            field_name='date_joined',
+            lookup_type='lte',
+            field_value=(
+                timezone.now() + timedelta(days=1)
+            ).strftime('%Y-%m-%d %H:%M:%S'),
+        )
@@ -0,0 +1,173 @@
+import asyncio
+import sys
+from unittest.mock import MagicMock, patch
+
+from asgiref.sync import async_to_sync
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage
+from django.test import TestCase, override_settings
+
+from drip.aio import (
+    AsyncEngine,
+    LocmemAsyncEmailBackend,
+    SMTPAsyncEmailBackend,
+    async_email_backend,
+)
+from drip.drips import DripMessage
+from drip.models import Drip, SentDrip
+from drip.tests.mixins import AudienceMixin
+
+
+class SlowBackend(LocmemAsyncEmailBackend):
+    """Tracks how many messages are sent at once."""
+    in_flight = 0
+    most_in_flight = 0
+    instances = 0
+
+    def __init__(self, *args, **kwargs):
+        super(SlowBackend, self).__init__(*args, **kwargs)
+        SlowBackend.instances += 1
+
+    async def send_messages(self, email_messages):
+        SlowBackend.in_flight += 1
+        SlowBackend.most_in_flight = max(
+            SlowBackend.most_in_flight, SlowBackend.in_flight,
+        )
+        await asyncio.sleep(0.01)
+        SlowBackend.in_flight -= 1
+        if email_messages[0].to == ['user_3@test.com']:
+            raise Exception('mailbox unavailable')
+        return await super(SlowBackend, self).send_messages(email_messages)
+
+
+class FakeSMTP(object):
+    """Stands for ``aiosmtplib.SMTP``, records what it is asked."""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.calls = []
+        FakeSMTP.instance = self
+
+    async def connect(self):
+        self.calls.append(('connect',))
+
+    async def login(self, username, password):
+        self.calls.append(('login', username, password))
+
+    async def sendmail(self, sender, recipients, message):
+        self.calls.append(('sendmail', sender, recipients, message))
+
+    async def quit(self):
+        self.calls.append(('quit',))
+
+
+class AsyncSendTestCase(AudienceMixin, TestCase):
+
+    def test_asend(self):
+        self.assertEqual(5, async_to_sync(self.model_drip.drip.asend)())
+        self.assertEqual(5, SentDrip.objects.count())
+        self.assertEqual(
+            sorted('HELLO user_{i}'.format(i=i) for i in range(5)),
+            sorted(email.subject for email in mail.outbox),
+        )
+
+    def test_arun_prunes_users_already_sent(self):
+        self.model_drip.enabled = True
+        self.model_drip.save()
+        self.assertEqual(5, async_to_sync(self.model_drip.drip.arun)())
+        self.assertEqual(0, async_to_sync(self.model_drip.drip.arun)())
+        self.assertEqual(5, len(mail.outbox))
+
+    def test_arun_of_a_disabled_drip(self):
+        self.model_drip.enabled = False
+        self.assertIsNone(async_to_sync(self.model_drip.drip.arun)())
+
+    @override_settings(
+        DRIP_ASYNC_EMAIL_BACKEND='{module}.SlowBackend'.format(
+            module=__name__,
+        ),
+    )
+    def test_concurrency_is_limited(self):
+        SlowBackend.most_in_flight = SlowBackend.instances = 0
+        drip = self.model_drip.drip
+        drip.from_email = 'drip@test.com'
+        engine = AsyncEngine(drip, DripMessage, concurrency=2, chunk_size=2)
+        self.assertEqual(4, async_to_sync(engine.run)())
+        self.assertEqual(2, SlowBackend.most_in_flight)
+        self.assertLessEqual(SlowBackend.instances, 2)
+        self.assertEqual([], engine.connections)
+        self.assertFalse(
+            SentDrip.objects.filter(user__username='user_3').exists(),
+        )
+
+    @override_settings(
+        DRIP_ASYNC_EMAIL_BACKEND='{module}.SlowBackend'.format(
+            module=__name__,
+        ),
+    )
+    def test_failures_of_users_with_deferred_columns_are_counted(self):
+        self.model_drip.subject_template = 'HELLO'
+        self.model_drip.save()
+        drip = Drip.objects.get(id=self.model_drip.id).drip
+        drip.from_email = 'drip@test.com'
+        engine = AsyncEngine(drip, DripMessage, concurrency=2, chunk_size=2)
+        with self.assertLogs(level='ERROR') as logs:
+            self.assertEqual(4, async_to_sync(engine.run)())
+        # the username, not read by the templates, isn't loaded to log
+        self.assertIn(
+            'to user {pk}: mailbox unavailable'.format(
+                pk=self.User.objects.get(username='user_3').pk,
+            ),
+            logs.output[0],
+        )
+        self.assertEqual((4, 1), (drip.stats.sent, drip.stats.failures))
+
+    @override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.console.EmailBackend',
+    )
+    def test_backend_needs_an_async_counterpart(self):
+        self.assertRaises(ImproperlyConfigured, async_email_backend)
+        with self.settings(DRIP_ASYNC_EMAIL_BACKEND='my.Backend'):
+            self.assertEqual('my.Backend', async_email_backend())
+
+
+class SMTPAsyncEmailBackendTestCase(TestCase):
+
+    def build_message(self):
+        return EmailMessage(
+            'Hi', 'Body', 'drip@test.com', ['user@test.com'],
+        )
+
+    def test_needs_aiosmtplib(self):
+        with patch.dict(sys.modules, {'aiosmtplib': None}):
+            self.assertRaises(
+                ImproperlyConfigured,
+                async_to_sync(SMTPAsyncEmailBackend().open),
+            )
+
+    @override_settings(EMAIL_HOST='smtp.test.com', EMAIL_PORT=2525)
+    def test_send_messages(self):
+        aiosmtplib = MagicMock()
+        aiosmtplib.SMTP = FakeSMTP
+        backend = SMTPAsyncEmailBackend(username='me', password='secret')
+
+        async def send():
+            async with backend:
+                return await backend.send_messages([self.build_message()])
+
+        with patch.dict(sys.modules, {'aiosmtplib': aiosmtplib}):
+            self.assertEqual(1, async_to_sync(send)())
+        client = FakeSMTP.instance
+        self.assertEqual('smtp.test.com', client.kwargs['hostname'])
+        self.assertEqual(2525, client.kwargs['port'])
+        self.assertEqual(
+            ['connect', 'login', 'sendmail', 'quit'],
+            [call[0] for call in client.calls],
+        )
+        self.assertEqual(('login', 'me', 'secret'), client.calls[1])
+        _, sender, recipients, message = client.calls[2]
+        self.assertEqual('drip@test.com', sender)
+        self.assertEqual(['user@test.com'], recipients)
+        self.assertIn(b'Subject: Hi', message)
+        self.assertIsNone(backend.client)
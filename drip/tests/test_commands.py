@@ -0,0 +1,106 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from drip.models import Drip, DripRun, SentDrip, QuerySetRule
+from drip.tests.mixins import AudienceMixin
+
+
+class FakeProcess(object):
+    """Runs the target of a forked process inline."""
+
+    def __init__(self, target, args):
+        self.target = target
+        self.args = args
+        self.exitcode = None
+
+    def start(self):
+        self.target(*self.args)
+        self.exitcode = 0
+
+    def join(self):
+        pass
+
+
+class SendDripsCommandTestCase(AudienceMixin, TestCase):
+    user_count = 6
+
+    def send_drips(self, **options):
+        stdout = StringIO()
+        options.setdefault('verbosity', 0)
+        call_command('send_drips', stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_send_drips(self):
+        self.send_drips()
+        self.assertEqual(6, SentDrip.objects.count())
+        self.assertEqual(6, len(mail.outbox))
+
+    def test_summary(self):
+        output = self.send_drips(verbosity=1)
+        self.assertIn('Everybody: sent 6, 0 failed', output)
+        run = DripRun.objects.get()
+        self.assertEqual(self.model_drip, run.drip)
+        self.assertEqual((6, 0, 6, 0), (
+            run.audience, run.pruned, run.sent, run.failures,
+        ))
+        self.assertGreaterEqual(run.duration, 0)
+
+        self.send_drips()
+        run = DripRun.objects.latest('started_at')
+        self.assertEqual((6, 6, 0), (run.audience, run.pruned, run.sent))
+
+    def test_send_some_drips(self):
+        other = Drip.objects.create(
+            name='Everybody again',
+            enabled=True,
+            subject_template='HELLO AGAIN',
+            body_html_template='KETTEHS STILL ROCK!',
+            schedule_interval='1 days',
+        )
+        QuerySetRule.objects.create(
+            drip=other,
+            field_name='id',
+            lookup_type='gte',
+            field_value='0',
+        )
+        self.send_drips(unscheduled=True)
+        self.assertEqual(0, SentDrip.objects.filter(drip=other).count())
+        self.send_drips(drips=[other.id])
+        self.assertEqual(6, SentDrip.objects.filter(drip=other).count())
+        self.assertEqual(12, SentDrip.objects.count())
+
+    def test_shards_split_the_audience(self):
+        sent = []
+        for index in range(3):
+            self.send_drips(shard='{index}/3'.format(index=index))
+            sent.append(SentDrip.objects.count() - sum(sent))
+        self.assertEqual([2, 2, 2], sent)
+        self.assertEqual(
+            6, SentDrip.objects.values('user').distinct().count(),
+        )
+
+    def test_invalid_shard(self):
+        self.assertRaises(
+            CommandError, self.send_drips, shard='3/3',
+        )
+        self.assertRaises(
+            CommandError, self.send_drips, shard='first',
+        )
+
+    def test_processes_send_every_shard(self):
+        with patch(
+            'multiprocessing.context.ForkContext.Process', FakeProcess,
+        ):
+            self.send_drips(processes=2)
+        self.assertEqual(6, SentDrip.objects.count())
+
+    def test_processes_and_shard_are_exclusive(self):
+        self.assertRaises(
+            CommandError,
+            self.send_drips, processes=2, shard='0/2',
+        )
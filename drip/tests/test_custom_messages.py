@@ -22,6 +22,26 @@ class PlainDripEmail(DripMessage):
         return self._message
 
 
+class Notification(object):
+    """Not an email, only knows how to send itself."""
+    sent = []
+
+    def __init__(self, user):
+        self.user = user
+
+    def send(self):
+        if self.user.email.startswith('fail'):
+            return False
+        Notification.sent.append(self.user.email)
+        return True
+
+
+class NotificationDripMessage(DripMessage):
+    @property
+    def message(self):
+        return Notification(self.user)
+
+
 class CustomMessagesTest(TestCase):
     def setUp(self):
         self.User = get_user_model()
@@ -90,3 +110,32 @@ class CustomMessagesTest(TestCase):
         self.assertEqual(1, len(mail.outbox))
         email = mail.outbox.pop()
         self.assertIsInstance(email, mail.EmailMessage)
+
+    def test_message_with_send_method(self):
+        Notification.sent = []
+        failing = self.User.objects.create(
+            username='failing', email='fail@example.com',
+        )
+        QuerySetRule.objects.create(
+            drip=self.model_drip,
+            field_name='id',
+            lookup_type='exact',
+            field_value=failing.id,
+            rule_type='or',
+        )
+        settings.DRIP_MESSAGE_CLASSES = {
+            # the module this test runs in, which has ``Notification.sent``
+            'notification': '{module}.NotificationDripMessage'.format(
+                module=__name__,
+            ),
+        }
+        self.model_drip.message_class = 'notification'
+        self.model_drip.save()
+        result = self.model_drip.drip.send()
+        self.assertEqual(1, result)
+        self.assertEqual(['custom@example.com'], Notification.sent)
+        self.assertEqual([], mail.outbox)
+        self.assertEqual(
+            [self.user.pk],
+            list(self.model_drip.sent_drips.values_list('user', flat=True)),
+        )
@@ -1,6 +1,7 @@
+import re
 from datetime import timedelta
 from drip.admin import DripAdmin
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.test.client import RequestFactory
 from django.urls import resolve, reverse
 from django.utils import timezone
@@ -8,7 +9,7 @@ from unittest.mock import patch
 from django.contrib.admin.sites import AdminSite
 
 
-from drip.models import Drip, SentDrip, QuerySetRule
+from drip.models import Drip, DripRun, SentDrip, QuerySetRule
 from drip.drips import DripBase
 from drip.utils import get_user_model, unicode
 from credits.models import Profile
@@ -151,6 +152,37 @@ class DripsTestCase(TestCase):
             bool([sf for sf in simple_fields if 'profile' in sf[0]]),
         )
 
+    def test_get_fields_is_repeatable(self):
+        from drip.utils import get_fields
+
+        self.assertEqual(get_fields(self.User), get_fields(self.User))
+
+    def test_give_model_field(self):
+        from drip.utils import give_model_field
+
+        full_key, name, _, field_class = give_model_field(
+            'profile__email', self.User,
+        )
+        self.assertEqual(('profile__email', 'email'), (full_key, name))
+        self.assertEqual('EmailField', field_class.__name__)
+        self.assertRaises(Exception, give_model_field, 'nope', self.User)
+
+    def test_field_graph_is_cached(self):
+        from drip.utils import field_graph_cache, get_field_graph
+
+        graph = get_field_graph(self.User)
+        self.assertIs(graph, get_field_graph(self.User))
+        with patch('drip.utils.apps.ready', False):
+            self.assertIsNot(graph, get_field_graph(self.User))
+        field_graph_cache.clear()
+
+    def test_get_simple_fields_are_copies(self):
+        from drip.utils import get_simple_fields
+
+        simple_fields = get_simple_fields(self.User)
+        simple_fields[0][0] = 'changed'
+        self.assertNotEqual('changed', get_simple_fields(self.User)[0][0])
+
     ##################
     #   TEST DRIPS   #
     ##################
@@ -242,6 +274,28 @@ class DripsTestCase(TestCase):
         ):
             self.assertEqual(count, shifted_drip.get_queryset().count())
 
+    def test_walk_reads_rules_once(self):
+        model_drip = self.build_joined_date_drip()
+        drip = model_drip.drip
+
+        with self.assertNumQueries(1 + 5):
+            # the rules, then one count per shifted drip
+            counts = [
+                shifted_drip.get_queryset().count()
+                for shifted_drip in drip.walk(into_past=3, into_future=2)
+            ]
+        self.assertEqual([0, 2, 2, 2, 2], counts)
+
+    def test_now_is_frozen(self):
+        drip = self.build_joined_date_drip().drip
+        self.assertEqual(drip.now(), drip.now())
+
+    def test_prefetched_rules_are_used(self):
+        self.build_joined_date_drip()
+        model_drip = Drip.objects.prefetch_related('queryset_rules').get()
+        with self.assertNumQueries(1):
+            model_drip.drip.get_queryset().count()
+
     def test_custom_drip_with_count(self):
         model_drip = self.build_joined_date_drip()
         QuerySetRule.objects.create(
@@ -374,6 +428,116 @@ class DripsTestCase(TestCase):
         # check that our admin (not excluded from test) is shown once.
         self.assertEqual(unicode(response.content).count(admin.email), 1)
 
+    def walk_first_days(self, drip, into_past, into_future):
+        """The timeline as built by walking and pruning every day."""
+        seen_users = set()
+        days = []
+        for shifted_drip in drip.walk(
+            into_past=into_past, into_future=into_future,
+        ):
+            shifted_drip.prune()
+            user_ids = set(
+                shifted_drip.get_queryset().values_list('id', flat=True)
+            )
+            days.append(sorted(user_ids - seen_users))
+            seen_users.update(user_ids)
+        return days
+
+    def test_first_days_match_walk(self):
+        model_drip = self.build_joined_date_drip()
+        SentDrip.objects.create(
+            drip=model_drip,
+            user=self.User.objects.get(username='first_no_credits'),
+            subject='s',
+            body='b',
+        )
+        drip = Drip.objects.get(id=model_drip.id).drip
+        walked_drips = drip.walk(into_past=3, into_future=10)
+        self.assertEqual(
+            self.walk_first_days(drip, 3, 10),
+            drip.get_first_days(walked_drips),
+        )
+
+    def test_first_days_with_count_rule(self):
+        model_drip = self.build_joined_date_drip(shift_one=2, shift_two=5)
+        QuerySetRule.objects.create(
+            drip=model_drip,
+            field_name='groups__count',
+            lookup_type='exact',
+            field_value='0',
+        )
+        drip = Drip.objects.get(id=model_drip.id).drip
+        days = drip.get_first_days(drip.walk(into_past=2, into_future=4))
+        self.assertEqual(self.walk_first_days(drip, 2, 4), days)
+        self.assertTrue(any(days))
+
+    def test_first_days_in_one_query(self):
+        model_drip = self.build_joined_date_drip()
+        drip = Drip.objects.get(id=model_drip.id).drip
+        walked_drips = drip.walk(into_past=3, into_future=30)
+        with self.assertNumQueries(1):
+            drip.get_first_days(walked_drips)
+
+    def test_count_first_days(self):
+        model_drip = self.build_joined_date_drip()
+        drip = Drip.objects.get(id=model_drip.id).drip
+        walked_drips = drip.walk(into_past=3, into_future=10)
+        days = drip.get_first_days(walked_drips)
+        with self.assertNumQueries(1):
+            counts = drip.count_first_days(walked_drips)
+        self.assertEqual([len(user_ids) for user_ids in days], counts)
+        self.assertTrue(any(counts))
+
+    def get_timeline(self, model_drip, admin, page=None):
+        timeline_url = reverse(
+            'admin:drip_timeline',
+            kwargs={
+                'drip_id': model_drip.id,
+                'into_past': 3,
+                'into_future': 3,
+            }
+        )
+        request = RequestFactory().get(
+            timeline_url, {'page': page} if page else {},
+        )
+        request.user = admin
+        match = resolve(timeline_url)
+        return match.func(request, *match.args, **match.kwargs)
+
+    @override_settings(DRIP_TIMELINE_PAGE_SIZE=1)
+    def test_admin_timeline_pages(self):
+        model_drip = self.build_joined_date_drip(shift_one=0, shift_two=3)
+        admin = self.User.objects.create(
+            username='admin', email='admin@example.com',
+            is_staff=True, is_superuser=True,
+        )
+        first_page = unicode(self.get_timeline(model_drip, admin).content)
+        second_page = unicode(
+            self.get_timeline(model_drip, admin, page=2).content,
+        )
+        self.assertIn('?page=2', first_page)
+        self.assertIn('?page=1', second_page)
+        user_link = r'/timeline/3/3/(\d+)/'
+        first_users = set(re.findall(user_link, first_page))
+        second_users = set(re.findall(user_link, second_page))
+        self.assertTrue(first_users)
+        self.assertTrue(second_users)
+        self.assertFalse(first_users & second_users)
+
+    @override_settings(DRIP_TIMELINE_PAGE_SIZE=1)
+    def test_admin_timeline_only_fetches_the_page(self):
+        model_drip = self.build_joined_date_drip(shift_one=0, shift_two=3)
+        admin = self.User.objects.create(
+            username='admin', email='admin@example.com',
+            is_staff=True, is_superuser=True,
+        )
+        with patch(
+            'drip.drips.DripBase.get_first_days',
+            side_effect=AssertionError('loads every user of the window'),
+        ):
+            content = unicode(self.get_timeline(model_drip, admin).content)
+        self.assertIn('?page=2', content)
+
     ##################
     #   TEST M2M     #
     ##################
@@ -593,3 +757,78 @@ class UrlsTestCase(TestCase):
             test_url_pattern.pattern._route,
             '<int:drip_id>/timeline/<int:into_past>/<int:into_future>/<uuid:user_id>/',  # noqa
         )
+
+    def test_field_data_url(self):
+        self.assertEqual(
+            reverse('admin:drip_field_data'), '/admin/drip/drip/field_data/',
+        )
+
+
+class FieldDataTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin',
+        )
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:drip_field_data')
+
+    def test_field_data_is_served_as_json(self):
+        from drip.utils import get_simple_fields
+
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/json', response['Content-Type'])
+        self.assertEqual(get_simple_fields(get_user_model()), response.json())
+        self.assertIn('private', response['Cache-Control'])
+        self.assertTrue(response['ETag'])
+
+    def test_unchanged_field_data_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.content)
+        self.assertEqual(etag, response['ETag'])
+
+    def test_change_form_does_not_embed_field_data(self):
+        from drip.utils import field_graph_cache
+
+        field_graph_cache.clear()
+        with patch('drip.utils.build_simple_fields') as build_simple_fields:
+            response = self.client.get(reverse('admin:drip_drip_add'))
+        self.assertEqual(200, response.status_code)
+        build_simple_fields.assert_not_called()
+        self.assertContains(response, self.url)
+
+    def test_field_data_requires_staff(self):
+        self.client.logout()
+        self.assertEqual(302, self.client.get(self.url).status_code)
+
+
+class DripRunAdminTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin',
+        )
+        self.client.force_login(self.admin)
+        model_drip = Drip.objects.create(name='Everybody')
+        DripRun.objects.create(
+            drip=model_drip,
+            started_at=timezone.now() - timedelta(seconds=90),
+            finished_at=timezone.now(),
+            audience=10,
+            pruned=4,
+            sent=6,
+            render_time=1.5,
+        )
+
+    def test_changelist(self):
+        response = self.client.get(reverse('admin:drip_driprun_changelist'))
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, 'Everybody')
+        self.assertContains(response, '1.5')
+
+    def test_runs_are_read_only(self):
+        response = self.client.get(reverse('admin:drip_driprun_add'))
+        self.assertEqual(403, response.status_code)
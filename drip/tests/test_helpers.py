@@ -0,0 +1,40 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from drip import helpers
+from drip.helpers import parse
+
+
+class ParseTestCase(TestCase):
+
+    def setUp(self):
+        parse.cache_clear()
+
+    def test_flexible_intervals(self):
+        self.assertEqual(timedelta(days=7), parse('7 days'))
+        self.assertEqual(
+            timedelta(weeks=1, days=2, hours=3), parse(' 1 week, 2 days 3h '),
+        )
+        self.assertEqual(timedelta(minutes=1.5), parse('1.5 minutes'))
+
+    def test_serialized_intervals(self):
+        self.assertEqual(
+            timedelta(days=2, hours=3, minutes=4, seconds=5),
+            parse('2 days, 03:04:05'),
+        )
+        self.assertEqual(timedelta(hours=-1, minutes=-30), parse('-1:30:00'))
+
+    def test_invalid_intervals(self):
+        self.assertRaises(TypeError, parse, '')
+        self.assertRaises(TypeError, parse, 'next tuesday')
+
+    def test_intervals_are_parsed_once(self):
+        with patch.object(
+            helpers, 'process_string', wraps=helpers.process_string,
+        ) as process_string:
+            for _ in range(3):
+                self.assertEqual(timedelta(days=7), parse('7 days'))
+        process_string.assert_called_once_with('7 days')
+        self.assertEqual(1, parse.cache_info().currsize)
@@ -0,0 +1,146 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from drip.metrics import (
+    NULL_COLLECTOR,
+    PrometheusCollector,
+    collectors,
+    get_collector,
+)
+from drip.models import Drip, QuerySetRule
+from drip.tests.mixins import AudienceMixin
+from drip.utils import get_user_model
+
+
+class MetricsTestCase(AudienceMixin, TestCase):
+
+    def setUp(self):
+        collectors.clear()
+        self.addCleanup(collectors.clear)
+        super(MetricsTestCase, self).setUp()
+
+    def run_failing_for_user_3(self):
+        connection = EmailBackend()
+        send_messages = connection.send_messages
+
+        def fail_for_user_3(messages):
+            if messages[0].to == ['user_3@test.com']:
+                raise Exception('mailbox unavailable')
+            return send_messages(messages)
+
+        drip = self.model_drip.drip
+        with patch('drip.drips.get_connection', return_value=connection):
+            with patch.object(
+                connection, 'send_messages', side_effect=fail_for_user_3,
+            ):
+                drip.run()
+        return drip
+
+    def test_no_collector_by_default(self):
+        self.assertIs(NULL_COLLECTOR, get_collector())
+        drip = self.run_failing_for_user_3()
+        self.assertIsNone(drip.stats.queries)
+
+    @override_settings(
+        DRIP_METRICS_COLLECTOR='drip.metrics.InMemoryCollector',
+    )
+    def test_send_path_metrics(self):
+        collector = get_collector()
+        self.assertIs(collector, get_collector())
+        drip = self.run_failing_for_user_3()
+        labels = {'drip': 'Everybody'}
+        self.assertEqual(
+            5, collector.get_counter('drip_messages_rendered_total', **labels),
+        )
+        self.assertEqual(
+            4, collector.get_counter('drip_messages_sent_total', **labels),
+        )
+        self.assertEqual(
+            1, collector.get_counter('drip_messages_failed_total', **labels),
+        )
+        for name, count in (
+            ('drip_render_seconds', 5),
+            ('drip_send_seconds', 5),
+            ('drip_prune_seconds', 1),
+            ('drip_persist_seconds', 1),
+            ('drip_query_seconds', 2),
+        ):
+            self.assertEqual(
+                count, len(collector.get_observations(name, **labels)), name,
+            )
+        self.assertEqual(
+            [drip.stats.queries],
+            collector.get_observations('drip_db_queries', **labels),
+        )
+        self.assertGreater(drip.stats.queries, 0)
+
+
+class PrometheusCollectorTestCase(TestCase):
+
+    def setUp(self):
+        collectors.clear()
+        self.addCleanup(collectors.clear)
+
+    def test_render(self):
+        collector = PrometheusCollector()
+        collector.increment('drip_messages_sent_total', 3, {'drip': 'a "b"'})
+        collector.increment('drip_messages_sent_total', 2, {'drip': 'a "b"'})
+        for seconds in (.002, .3, 20):
+            collector.observe('drip_send_seconds', seconds, {'drip': 'c'})
+        collector.observe('drip_db_queries', 42, {'drip': 'c'})
+        lines = collector.render().splitlines()
+        for line in (
+            '# HELP drip_messages_sent_total Messages sent.',
+            '# TYPE drip_messages_sent_total counter',
+            'drip_messages_sent_total{drip="a \\"b\\""} 5',
+            '# TYPE drip_send_seconds histogram',
+            'drip_send_seconds_bucket{drip="c",le="0.005"} 1',
+            'drip_send_seconds_bucket{drip="c",le="0.25"} 1',
+            'drip_send_seconds_bucket{drip="c",le="0.5"} 2',
+            'drip_send_seconds_bucket{drip="c",le="10.0"} 2',
+            'drip_send_seconds_bucket{drip="c",le="+Inf"} 3',
+            'drip_send_seconds_sum{drip="c"} 20.302',
+            'drip_send_seconds_count{drip="c"} 3',
+            'drip_db_queries_bucket{drip="c",le="10.0"} 0',
+            'drip_db_queries_bucket{drip="c",le="50.0"} 1',
+            'drip_db_queries_sum{drip="c"} 42',
+        ):
+            self.assertIn(line, lines)
+
+    def test_send_drips_exports_textfile(self):
+        User = get_user_model()
+        User.objects.create(username='user', email='user@test.com')
+        model_drip = Drip.objects.create(
+            name='Everybody',
+            enabled=True,
+            subject_template='HELLO',
+            body_html_template='KETTEHS ROCK!',
+        )
+        QuerySetRule.objects.create(
+            drip=model_drip,
+            field_name='id',
+            lookup_type='gte',
+            field_value='0',
+        )
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'drip-{pid}.prom')
+        with override_settings(
+            DRIP_METRICS_COLLECTOR='drip.metrics.PrometheusCollector',
+            DRIP_METRICS_TEXTFILE=path,
+        ):
+            call_command('send_drips', stdout=StringIO())
+        exported = path.format(pid=os.getpid())
+        self.assertEqual([os.path.basename(exported)], os.listdir(directory))
+        with open(exported) as textfile:
+            self.assertIn(
+                'drip_messages_sent_total{drip="Everybody"} 1\n',
+                textfile.read(),
+            )
+        os.remove(exported)
+        os.rmdir(directory)
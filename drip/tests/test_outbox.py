@@ -0,0 +1,179 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from drip.drips import DripMessage
+from drip.models import Drip, OutboxMessage, SentDrip
+from drip.outbox import Outbox
+from drip.tests.mixins import AudienceMixin
+
+
+class OutboxTestCase(AudienceMixin, TestCase):
+
+    def get_outbox(self, **kwargs):
+        return Outbox(Drip.objects.get(id=self.model_drip.id).drip, **kwargs)
+
+    def test_enqueue_materializes_the_audience_once(self):
+        self.assertEqual(5, self.get_outbox().enqueue())
+        self.get_outbox().enqueue()
+        self.assertEqual(
+            5, OutboxMessage.objects.filter(status='pending').count(),
+        )
+
+    def test_workers_claim_distinct_batches(self):
+        self.get_outbox().enqueue()
+        first = self.get_outbox(batch_size=3).claim()
+        second = self.get_outbox(batch_size=3).claim()
+        self.assertEqual(3, len(first))
+        self.assertEqual(2, len(second))
+        self.assertFalse(
+            {m.pk for m in first} & {m.pk for m in second},
+        )
+
+    def test_claimed_users_only_load_columns_read(self):
+        self.get_outbox().enqueue()
+        claimed = self.get_outbox().claim()
+        self.assertIn('first_name', claimed[0].user.get_deferred_fields())
+        with self.assertNumQueries(0):
+            for outbox_message in claimed:
+                DripMessage(
+                    self.model_drip.drip, outbox_message.user,
+                ).message
+
+    def test_claim_with_skip_locked(self):
+        self.get_outbox().enqueue()
+        outbox = self.get_outbox(batch_size=2)
+        with patch.object(
+            connection.features, 'has_select_for_update_skip_locked', True,
+        ), patch.object(
+            connection.features, 'has_select_for_update', False,
+        ):
+            claimed = outbox.claim()
+        self.assertEqual(2, len(claimed))
+        self.assertEqual(
+            2, OutboxMessage.objects.filter(claimed_by=outbox.worker).count(),
+        )
+
+    def test_claim_loses_rows_claimed_meanwhile(self):
+        self.get_outbox().enqueue()
+        outbox = self.get_outbox(batch_size=5)
+        pending = outbox.get_pending
+        calls = []
+
+        def claimed_by_another_worker():
+            calls.append(True)
+            if len(calls) == 2:
+                # between reading the candidates and claiming them
+                OutboxMessage.objects.filter(
+                    pk=pending().order_by('pk').first().pk,
+                ).update(status='claimed', claimed_by='another')
+            return pending()
+
+        with patch.object(
+            outbox, 'get_pending', side_effect=claimed_by_another_worker,
+        ):
+            self.assertEqual(4, len(outbox.claim()))
+
+    def test_send_marks_messages_sent(self):
+        outbox = self.get_outbox(batch_size=2)
+        outbox.enqueue()
+        self.assertEqual(5, outbox.send(DripMessage))
+        self.assertEqual(5, SentDrip.objects.count())
+        self.assertEqual(
+            5, OutboxMessage.objects.filter(status='sent').count(),
+        )
+
+    def test_second_worker_does_not_send_again(self):
+        first = self.get_outbox()
+        first.enqueue()
+        first.send(DripMessage)
+        # the second worker did not prune, it relies on the outbox alone
+        second = self.get_outbox()
+        second.enqueue()
+        self.assertEqual(0, second.send(DripMessage))
+        self.assertEqual(5, len(mail.outbox))
+
+    def test_failed_messages_are_requeued(self):
+        outbox = self.get_outbox()
+        outbox.enqueue()
+        with patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=Exception('relay down'),
+        ):
+            self.assertEqual(0, outbox.send(DripMessage))
+        self.assertEqual(
+            5, OutboxMessage.objects.filter(status='failed').count(),
+        )
+        outbox = self.get_outbox()
+        outbox.enqueue()
+        self.assertEqual(5, outbox.send(DripMessage))
+
+    def test_users_who_left_the_audience_are_dropped(self):
+        self.get_outbox().enqueue()
+        with patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=Exception('relay down'),
+        ):
+            self.get_outbox().send(DripMessage)
+        # no longer matched by the date_joined rule
+        self.User.objects.filter(username__in=['user_0', 'user_1']).update(
+            date_joined=timezone.now() + timedelta(days=2),
+        )
+        outbox = self.get_outbox()
+        outbox.enqueue()
+        self.assertEqual(3, outbox.send(DripMessage))
+        self.assertEqual(
+            ['user_2@test.com', 'user_3@test.com', 'user_4@test.com'],
+            sorted(email.to[0] for email in mail.outbox),
+        )
+        self.assertFalse(OutboxMessage.objects.filter(
+            user__username__in=['user_0', 'user_1'],
+        ).exists())
+
+    def test_shards_only_deal_with_their_users(self):
+        outboxes = []
+        for index in range(2):
+            drip = Drip.objects.get(id=self.model_drip.id).drip
+            drip.shard = (index, 2)
+            outboxes.append(Outbox(drip))
+        user_ids = sorted(self.User.objects.values_list('pk', flat=True))
+        even = [pk for pk in user_ids if pk % 2 == 0]
+        odd = [pk for pk in user_ids if pk % 2 == 1]
+        self.assertEqual(len(odd), outboxes[1].enqueue())
+        self.assertEqual(len(even), outboxes[0].enqueue())
+        # enqueueing shard 0 again doesn't drop the rows of shard 1
+        outboxes[0].enqueue()
+        self.assertEqual(
+            user_ids,
+            sorted(OutboxMessage.objects.values_list('user', flat=True)),
+        )
+        self.assertEqual(len(even), outboxes[0].send(DripMessage))
+        self.assertEqual(
+            even, sorted(SentDrip.objects.values_list('user', flat=True)),
+        )
+        self.assertEqual(
+            len(odd), OutboxMessage.objects.filter(status='pending').count(),
+        )
+        self.assertEqual(len(odd), outboxes[1].send(DripMessage))
+        self.assertEqual(5, SentDrip.objects.count())
+
+    def test_timed_out_claims_are_requeued(self):
+        self.get_outbox().enqueue()
+        self.get_outbox().claim()
+        OutboxMessage.objects.update(
+            claimed_at=timezone.now() - timedelta(hours=2),
+        )
+        self.assertEqual(5, self.get_outbox().requeue())
+
+    @override_settings(DRIP_USE_OUTBOX=True)
+    def test_run_through_the_outbox(self):
+        self.model_drip.enabled = True
+        self.model_drip.save()
+        self.assertEqual(5, self.model_drip.drip.run())
+        self.assertEqual(5, OutboxMessage.objects.count())
+        self.assertEqual(0, self.model_drip.drip.run())
+        self.assertEqual(5, len(mail.outbox))
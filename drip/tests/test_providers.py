@@ -0,0 +1,127 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+
+from credits.models import Profile
+from drip.drips import DripBase, DripMessage
+from drip.providers import ContextProvider, ModelContextProvider
+from drip.tests.mixins import AudienceMixin
+
+
+class ProfileProvider(ModelContextProvider):
+    name = 'profile'
+    model = Profile
+
+
+class InitialProvider(ContextProvider):
+
+    def load(self, drip_base, users):
+        return {user.pk: {'initial': user.username[0]} for user in users}
+
+
+class GroupsDrip(DripBase):
+    name = 'Groups'
+    prefetch_related = ('groups',)
+
+
+class ProfileDrip(DripBase):
+    name = 'Profiles'
+    select_related = ('profile',)
+
+
+class ContextProviderTestCase(AudienceMixin, TestCase):
+    body_html_template = '{{ profile.credits }} credits'
+
+    def setUp(self):
+        super(ContextProviderTestCase, self).setUp()
+        group = Group.objects.create(name='cats')
+        for i in range(self.user_count):
+            user = self.User.objects.get(username='user_{i}'.format(i=i))
+            user.groups.add(group)
+            Profile.objects.filter(user=user).update(credits=i)
+
+    def render(self, drip, chunk_size=None):
+        return sorted(
+            DripMessage(drip, user).body
+            for user in drip.iter_audience(chunk_size=chunk_size)
+        )
+
+    def test_provider_loads_a_chunk_with_one_query(self):
+        drip = DripBase(
+            drip_model=self.model_drip,
+            name='Profiles',
+            body_template='{{ profile.credits }} credits',
+            context_providers=[ProfileProvider()],
+        )
+        drip.get_queryset()
+        with self.assertNumQueries(6):
+            # a page of users, then their profiles, for each page
+            bodies = self.render(drip, chunk_size=2)
+        self.assertEqual(
+            ['{i} credits'.format(i=i) for i in range(5)], bodies,
+        )
+
+    @override_settings(DRIP_SEND_CHUNK_SIZE=2)
+    def test_unchunked_audience_is_prepared_in_batches(self):
+        drip = DripBase(
+            drip_model=self.model_drip,
+            name='Profiles',
+            body_template='{{ profile.credits }} credits',
+            context_providers=[ProfileProvider()],
+        )
+        drip.get_queryset()
+        with self.assertNumQueries(4):
+            # the whole audience, then its profiles two users at a time
+            bodies = self.render(drip)
+        self.assertEqual(
+            ['{i} credits'.format(i=i) for i in range(5)], bodies,
+        )
+
+    @override_settings(DRIP_CONTEXT_PROVIDERS=[
+        'drip.tests.test_providers.ProfileProvider',
+        'drip.tests.test_providers.InitialProvider',
+    ])
+    def test_configured_providers(self):
+        self.model_drip.body_html_template = (
+            '{{ initial }}: {{ profile.credits }}'
+        )
+        self.model_drip.save()
+        self.assertEqual(
+            ['u: {i}'.format(i=i) for i in range(5)],
+            self.render(self.model_drip.drip),
+        )
+
+    def test_context_of_a_single_user(self):
+        drip = DripBase(
+            drip_model=self.model_drip,
+            name='Profiles',
+            body_template='{{ profile.credits }} credits',
+            context_providers=[ProfileProvider()],
+        )
+        user = self.User.objects.get(username='user_3')
+        self.assertEqual('3 credits', DripMessage(drip, user).body)
+
+    def test_declared_prefetch_related(self):
+        drip = GroupsDrip(
+            drip_model=self.model_drip,
+            body_template=(
+                '{% for group in user.groups.all %}{{ group }}{% endfor %}'
+            ),
+        )
+        drip.get_queryset()
+        with self.assertNumQueries(2):
+            bodies = self.render(drip)
+        self.assertEqual(['cats'] * 5, bodies)
+
+    def test_declared_select_related_with_pruned_columns(self):
+        drip = ProfileDrip(
+            drip_model=self.model_drip,
+            body_template='{{ user.profile.credits }} credits',
+        )
+        drip.get_queryset()
+        with self.assertNumQueries(1):
+            users = list(drip.iter_audience())
+            self.assertEqual(
+                list(range(5)),
+                sorted(user.profile.credits for user in users),
+            )
+        self.assertIn('first_name', users[0].get_deferred_fields())
@@ -0,0 +1,164 @@
+from unittest.mock import patch
+
+from django.template import Context, Template
+from django.test import TestCase
+from django.utils.html import strip_tags
+
+from drip.drips import DripMessage
+from drip.models import Drip
+from drip.rendering import DripTemplate, TemplateCache, template_cache
+from drip.utils import get_user_model
+
+
+class FooterDripMessage(DripMessage):
+    @property
+    def body(self):
+        return super(FooterDripMessage, self).body + '<p>Unsubscribe</p>'
+
+
+class TemplateCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.User = get_user_model()
+        self.model_drip = Drip.objects.create(
+            name='Templates',
+            subject_template='HELLO {{ user.username }}',
+            body_html_template='<p>Hi {{ user.email }}</p>',
+        )
+        template_cache.clear()
+
+    def test_template_is_compiled_once(self):
+        cache = TemplateCache(max_size=4)
+        first = cache.get('HELLO {{ user }}', self.model_drip)
+        second = cache.get('HELLO {{ user }}', self.model_drip)
+        self.assertIs(first, second)
+        self.assertEqual(
+            'HELLO you', first.render(Context({'user': 'you'})),
+        )
+
+    def test_edited_drip_is_recompiled(self):
+        cache = TemplateCache(max_size=4)
+        first = cache.get('HELLO', self.model_drip)
+        self.model_drip.save()
+        self.assertIsNot(first, cache.get('HELLO', self.model_drip))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TemplateCache(max_size=2)
+        first = cache.get('one')
+        cache.get('two')
+        cache.get('one')
+        cache.get('three')
+        self.assertEqual(2, len(cache))
+        self.assertIs(first, cache.get('one'))
+        self.assertNotIn(cache.get_key('two'), cache.templates)
+
+    def test_messages_share_compiled_templates(self):
+        drip = self.model_drip.drip
+        with patch(
+            'drip.rendering.Template', wraps=Template,
+        ) as compile_template:
+            for i in range(3):
+                user = self.User.objects.create(
+                    username='user_{i}'.format(i=i),
+                    email='user_{i}@test.com'.format(i=i),
+                )
+                message = DripMessage(drip, user)
+                self.assertEqual(
+                    'HELLO user_{i}'.format(i=i), message.subject,
+                )
+                self.assertIn(user.email, message.body)
+        self.assertEqual(2, compile_template.call_count)
+
+
+class DripTemplateTestCase(TestCase):
+
+    def render(self, template, user='you'):
+        return template.render(Context({'user': user}))
+
+    def test_static_templates(self):
+        for source in (
+            'Our weekly news',
+            '{% load static %}{# hidden #}Hi {{ "there"|upper }}',
+            '{{ "a"|add:"b" }}',
+        ):
+            self.assertTrue(DripTemplate(source).static, source)
+
+    def test_templates_reading_the_context(self):
+        for source in (
+            'Hi {{ user.username }}',
+            '{{ "Hi "|add:user }}',
+            '{% if user %}Hi{% endif %}',
+            '{% now "Y" %}',
+        ):
+            self.assertFalse(DripTemplate(source).static, source)
+
+    def test_static_template_is_rendered_once(self):
+        template = DripTemplate('<p>Our {{ "weekly"|upper }} news</p>')
+        with patch.object(
+            template.template, 'render', wraps=template.template.render,
+        ) as render:
+            self.assertEqual('<p>Our WEEKLY news</p>', self.render(template))
+            self.assertEqual('<p>Our WEEKLY news</p>', self.render(template))
+            self.assertEqual(
+                'Our WEEKLY news',
+                template.render_plain(Context({'user': 'me'})),
+            )
+        render.assert_called_once()
+
+    def test_static_parts_are_folded(self):
+        template = DripTemplate(
+            '<p>{{ "Hello"|lower }}, </p>{{ user }}<p>{{ "bye" }}</p>',
+        )
+        self.assertEqual(3, len(template.template.nodelist))
+        self.assertEqual('<p>hello, </p>you<p>bye</p>', self.render(template))
+        self.assertEqual('<p>hello, </p>me<p>bye</p>', self.render(
+            template, user='me',
+        ))
+
+    def test_folded_parts_render_like_the_template(self):
+        source = '{{ "<b>" }}{{ 1.5|floatformat }} {{ user }}'
+        self.assertEqual(
+            Template(source).render(Context({'user': '<i>'})),
+            self.render(DripTemplate(source), '<i>'),
+        )
+
+    def test_messages_share_a_static_body(self):
+        User = get_user_model()
+        model_drip = Drip.objects.create(
+            name='Static',
+            subject_template='Our weekly news',
+            body_html_template='<h1>News</h1>',
+        )
+        template_cache.clear()
+        drip = model_drip.drip
+        with patch(
+            'drip.rendering.strip_tags', wraps=strip_tags,
+        ) as strip_body:
+            for i in range(3):
+                user = User.objects.create(
+                    username='user_{i}'.format(i=i),
+                    email='user_{i}@test.com'.format(i=i),
+                )
+                message = DripMessage(drip, user).message
+                self.assertEqual('Our weekly news', message.subject)
+                self.assertEqual('News', message.body)
+                self.assertEqual(
+                    [('<h1>News</h1>', 'text/html')], message.alternatives,
+                )
+        strip_body.assert_called_once_with('<h1>News</h1>')
+
+    def test_overridden_body_is_stripped(self):
+        model_drip = Drip.objects.create(
+            name='Static',
+            subject_template='Our weekly news',
+            body_html_template='<h1>News</h1>',
+        )
+        user = get_user_model().objects.create(
+            username='user', email='user@test.com',
+        )
+        message = FooterDripMessage(model_drip.drip, user).message
+        self.assertEqual('NewsUnsubscribe', message.body)
+        self.assertEqual(
+            [('<h1>News</h1><p>Unsubscribe</p>', 'text/html')],
+            message.alternatives,
+        )
@@ -0,0 +1,281 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+import pytz
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from django.core.exceptions import ValidationError
+from django.db import OperationalError
+from django.test import TestCase
+from django.utils import timezone
+
+from drip.models import Drip, SchedulerLease
+from drip.scheduler import cron_scheduler
+from drip.scheduler.lease import Lease
+from drip.scheduler.triggers import OffsetTrigger, get_schedule_trigger
+
+
+class LeaseTestCase(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.first = Lease('send_drips', 60, holder='first')
+        self.second = Lease('send_drips', 60, holder='second')
+
+    def at(self, seconds):
+        return patch(
+            'drip.scheduler.lease.conditional_now',
+            return_value=self.now + timedelta(seconds=seconds),
+        )
+
+    def test_only_one_holder(self):
+        with self.at(0):
+            self.assertTrue(self.first.acquire())
+            self.assertFalse(self.second.acquire())
+        lease = SchedulerLease.objects.get(name='send_drips')
+        self.assertEqual('first', lease.holder)
+        self.assertEqual(self.now + timedelta(seconds=60), lease.expires_at)
+
+    def test_holder_renews(self):
+        with self.at(0):
+            self.first.acquire()
+        with self.at(50):
+            self.assertTrue(self.first.acquire())
+        with self.at(100):
+            self.assertFalse(self.second.acquire())
+        self.assertEqual(
+            self.now + timedelta(seconds=110),
+            SchedulerLease.objects.get(name='send_drips').expires_at,
+        )
+
+    def test_expired_lease_is_taken_over(self):
+        with self.at(0):
+            self.first.acquire()
+        with self.at(61):
+            self.assertTrue(self.second.acquire())
+            self.assertFalse(self.first.acquire())
+
+    def test_released_lease_is_taken_at_once(self):
+        with self.at(0):
+            self.first.acquire()
+            self.first.release()
+            self.assertTrue(self.second.acquire())
+        self.assertEqual(1, SchedulerLease.objects.count())
+
+    def test_leases_are_independent(self):
+        with self.at(0):
+            self.first.acquire()
+            self.assertTrue(Lease('other', 60, holder='second').acquire())
+
+
+class CronSchedulerTestCase(TestCase):
+
+    def start(self):
+        with patch.object(cron_scheduler, 'DRIP_SCHEDULE', True), patch.object(
+            cron_scheduler, 'BackgroundScheduler',
+        ) as BackgroundScheduler, patch.object(cron_scheduler, 'atexit'):
+            cron_scheduler.cron_send_drips()
+        jobs = BackgroundScheduler.return_value.add_job.call_args_list
+        return {args[0].__name__: args[0] for args, kwargs in jobs}
+
+    def test_schedules_send_drips_and_renewal(self):
+        jobs = self.start()
+        self.assertEqual(
+            {'call_send_drips_command', 'renew_lease', 'sync'}, set(jobs),
+        )
+
+    @patch.object(cron_scheduler, 'call_command')
+    def test_only_the_leader_sends(self, call_command):
+        leader = self.start()
+        follower = self.start()
+        leader['call_send_drips_command']()
+        follower['call_send_drips_command']()
+        follower['renew_lease']()
+        leader['call_send_drips_command']()
+        call_command.assert_called_with('send_drips', unscheduled=True)
+        self.assertEqual(2, call_command.call_count)
+
+    @patch.object(cron_scheduler, 'call_command')
+    def test_follower_takes_over(self, call_command):
+        leader = self.start()
+        follower = self.start()
+        leader['call_send_drips_command']()
+        SchedulerLease.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        follower['renew_lease']()
+        leader['call_send_drips_command']()
+        follower['call_send_drips_command']()
+        self.assertEqual(2, call_command.call_count)
+
+    def test_database_errors_mean_not_leader(self):
+        jobs = self.start()
+        with patch.object(
+            cron_scheduler, 'close_old_connections',
+        ) as close_old_connections, patch.object(
+            Lease, 'acquire',
+            side_effect=OperationalError('server closed the connection'),
+        ), patch.object(
+            cron_scheduler, 'call_command',
+        ) as call_command, self.assertLogs(level='ERROR'):
+            jobs['renew_lease']()
+            jobs['call_send_drips_command']()
+        call_command.assert_not_called()
+        # before and after every attempt, from the scheduler's threads
+        self.assertEqual(4, close_old_connections.call_count)
+
+    def test_disabled_schedule(self):
+        with patch.object(
+            cron_scheduler, 'BackgroundScheduler',
+        ) as BackgroundScheduler:
+            self.assertIsNone(cron_scheduler.cron_send_drips())
+        BackgroundScheduler.assert_not_called()
+
+
+class ScheduleTriggerTestCase(TestCase):
+
+    def setUp(self):
+        self.start = datetime(2020, 1, 6, 8, 30, tzinfo=pytz.utc)
+
+    def test_cron_schedule(self):
+        trigger = get_schedule_trigger(
+            Drip(schedule_cron='0 9 * * mon-fri'), timezone='UTC',
+        )
+        self.assertIsInstance(trigger, CronTrigger)
+        self.assertEqual(
+            datetime(2020, 1, 6, 9, tzinfo=pytz.utc),
+            trigger.get_next_fire_time(None, self.start),
+        )
+
+    def test_interval_schedule(self):
+        trigger = get_schedule_trigger(
+            Drip(schedule_interval='6 hours'), timezone='UTC',
+        )
+        self.assertIsInstance(trigger, IntervalTrigger)
+        self.assertEqual(timedelta(hours=6), trigger.interval)
+
+    def test_no_schedule(self):
+        self.assertIsNone(get_schedule_trigger(Drip()))
+
+    def test_offset(self):
+        trigger = OffsetTrigger(
+            get_schedule_trigger(
+                Drip(schedule_cron='0 9 * * *'), timezone='UTC',
+            ),
+            90,
+        )
+        first = trigger.get_next_fire_time(None, self.start)
+        self.assertEqual(
+            datetime(2020, 1, 6, 9, 1, 30, tzinfo=pytz.utc), first,
+        )
+        self.assertEqual(
+            datetime(2020, 1, 7, 9, 1, 30, tzinfo=pytz.utc),
+            trigger.get_next_fire_time(first, first),
+        )
+        # still due in the offset after the schedule
+        self.assertEqual(
+            first,
+            trigger.get_next_fire_time(
+                None, datetime(2020, 1, 6, 9, 1, tzinfo=pytz.utc),
+            ),
+        )
+
+    def test_validation(self):
+        for schedule in (
+            dict(schedule_cron='0 9 * *'),
+            dict(schedule_cron='0 25 * * *'),
+            dict(schedule_interval='often'),
+            dict(schedule_interval='-1 days'),
+            dict(schedule_cron='0 9 * * *', schedule_interval='1 days'),
+        ):
+            self.assertRaises(ValidationError, Drip(**schedule).clean)
+        Drip(schedule_cron='*/15 9-17 * * mon-fri').clean()
+        Drip(schedule_interval='1 days, 12:00:00').clean()
+
+
+class DripJobsTestCase(TestCase):
+
+    def setUp(self):
+        self.scheduler = Mock()
+        self.scheduler.get_job.return_value = Mock()
+        self.lease = Lease('send_drips', 60, holder='first')
+        self.jobs = cron_scheduler.DripJobs(
+            self.scheduler, self.lease, stagger=600, timezone='UTC',
+        )
+        self.drips = [
+            Drip.objects.create(
+                name='drip {i}'.format(i=i),
+                enabled=True,
+                schedule_cron='0 9 * * *',
+            )
+            for i in range(3)
+        ]
+        Drip.objects.create(name='unscheduled', enabled=True)
+        Drip.objects.create(
+            name='disabled', schedule_interval='1 hours',
+        )
+
+    def added(self):
+        return {
+            call[1]['id']: call
+            for call in self.scheduler.add_job.call_args_list
+        }
+
+    def test_job_per_scheduled_drip(self):
+        self.jobs.sync()
+        added = self.added()
+        self.assertEqual(
+            ['drip_{id}'.format(id=drip.id) for drip in self.drips],
+            sorted(added),
+        )
+        for drip, offset in zip(self.drips, (0, 200, 400)):
+            call = added['drip_{id}'.format(id=drip.id)]
+            self.assertEqual((drip.id,), call[1]['args'])
+            self.assertTrue(call[1]['coalesce'])
+            self.assertEqual(1, call[1]['max_instances'])
+            trigger = call[0][1]
+            if offset:
+                self.assertEqual(
+                    timedelta(seconds=offset), trigger.offset,
+                )
+            else:
+                self.assertIsInstance(trigger, CronTrigger)
+
+    def test_sync_only_applies_changes(self):
+        self.jobs.sync()
+        self.scheduler.add_job.reset_mock()
+        self.jobs.sync()
+        self.scheduler.add_job.assert_not_called()
+
+        self.drips[0].schedule_cron = '0 10 * * *'
+        self.drips[0].save()
+        self.drips[2].enabled = False
+        self.drips[2].save()
+        self.jobs.sync()
+        # the offsets of the remaining drips changed too
+        self.assertEqual(
+            {'drip_{id}'.format(id=drip.id) for drip in self.drips[:2]},
+            set(self.added()),
+        )
+        self.scheduler.remove_job.assert_called_once_with(
+            'drip_{id}'.format(id=self.drips[2].id),
+        )
+
+    def test_invalid_schedule_is_skipped(self):
+        Drip.objects.filter(id=self.drips[1].id).update(
+            schedule_cron='never',
+        )
+        with self.assertLogs(level='ERROR'):
+            self.jobs.sync()
+        self.assertEqual(2, len(self.added()))
+
+    @patch.object(cron_scheduler, 'call_command')
+    def test_only_the_leader_sends(self, call_command):
+        self.jobs.send(self.drips[0].id)
+        Lease('send_drips', 60, holder='second').acquire()
+        cron_scheduler.DripJobs(
+            self.scheduler, Lease('send_drips', 60, holder='second'),
+        ).send(self.drips[0].id)
+        call_command.assert_called_once_with(
+            'send_drips', drips=[self.drips[0].id],
+        )
@@ -0,0 +1,686 @@
+import pickle
+import sys
+import threading
+import uuid
+from concurrent.futures import Executor, Future
+from datetime import timedelta
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from drip.drips import DripBase, DripMessage, SentDripWriter
+from drip.engines import PipelineEngine, ProcessEngine, ThreadedEngine
+from drip.models import (
+    Drip,
+    DripRun,
+    SentDrip,
+    QuerySetRule,
+    TestUserUUIDModel,
+)
+from drip.render_worker import build_drip, get_drip_state, render_chunk
+from drip.tests.mixins import AudienceMixin
+
+
+class UUIDDrip(DripBase):
+    name = 'UUID users'
+
+    def get_queryset(self):
+        return TestUserUUIDModel.objects.all()
+
+
+class FirstNameDripMessage(DripMessage):
+    @property
+    def subject(self):
+        return 'HELLO {name}'.format(name=self.user.first_name)
+
+
+class InlineExecutor(Executor):
+    """Runs what a process pool would, in the calling thread, where the
+    test database is visible.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        # what a process pool would pickle
+        self.calls.append(pickle.loads(pickle.dumps(args)))
+        future = Future()
+        try:
+            future.set_result(fn(*self.calls[-1]))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class SendingTestCase(AudienceMixin, TestCase):
+
+    def build_sent_drips(self):
+        return [
+            SentDrip(drip=self.model_drip, user=user, subject='s', body='b')
+            for user in self.User.objects.all()
+        ]
+
+    ##########################
+    #   SENT DRIP BATCHING   #
+    ##########################
+
+    def test_writer_flushes_in_batches(self):
+        with patch.object(
+            SentDrip.objects, 'bulk_create',
+            wraps=SentDrip.objects.bulk_create,
+        ) as bulk_create:
+            with SentDripWriter(batch_size=2) as writer:
+                for sent_drip in self.build_sent_drips():
+                    writer.add(sent_drip)
+        self.assertEqual(
+            [2, 2, 1],
+            [len(args[0]) for args, kwargs in bulk_create.call_args_list],
+        )
+        self.assertEqual(5, SentDrip.objects.count())
+
+    def test_writer_keeps_rows_when_a_batch_fails(self):
+        bulk_create = SentDrip.objects.bulk_create
+        calls = []
+
+        def failing_second_batch(batch):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise Exception('database went away')
+            return bulk_create(batch)
+
+        with patch.object(
+            SentDrip.objects, 'bulk_create', side_effect=failing_second_batch,
+        ):
+            with SentDripWriter(batch_size=2) as writer:
+                for sent_drip in self.build_sent_drips():
+                    writer.add(sent_drip)
+        # the failed batch is saved row by row
+        self.assertEqual(5, SentDrip.objects.count())
+
+    @override_settings(DRIP_SENT_DRIP_BATCH_SIZE=2)
+    def test_send_records_sent_drips_in_batches(self):
+        with patch.object(
+            SentDrip.objects, 'bulk_create',
+            wraps=SentDrip.objects.bulk_create,
+        ) as bulk_create:
+            self.assertEqual(5, self.model_drip.drip.send())
+        self.assertEqual(3, bulk_create.call_count)
+        self.assertEqual(5, SentDrip.objects.count())
+        self.assertEqual(5, len(mail.outbox))
+
+    ###########################
+    #   CONNECTION SHARING    #
+    ###########################
+
+    @override_settings(DRIP_SEND_CHUNK_SIZE=2)
+    def test_send_reuses_one_connection(self):
+        connection = EmailBackend()
+        with patch('drip.drips.get_connection', return_value=connection):
+            with patch.object(
+                connection, 'open', wraps=connection.open,
+            ) as open_connection, patch.object(
+                connection, 'send_messages', wraps=connection.send_messages,
+            ) as send_messages:
+                self.assertEqual(5, self.model_drip.drip.send())
+        open_connection.assert_called_once_with()
+        self.assertEqual(5, send_messages.call_count)
+        self.assertEqual(5, len(mail.outbox))
+
+    def test_send_failure_is_not_recorded(self):
+        connection = EmailBackend()
+        send_messages = connection.send_messages
+
+        def fail_for_user_3(messages):
+            if messages[0].to == ['user_3@test.com']:
+                raise Exception('mailbox unavailable')
+            return send_messages(messages)
+
+        with patch('drip.drips.get_connection', return_value=connection):
+            with patch.object(
+                connection, 'send_messages', side_effect=fail_for_user_3,
+            ):
+                self.assertEqual(4, self.model_drip.drip.send())
+        self.assertEqual(4, SentDrip.objects.count())
+        self.assertFalse(
+            SentDrip.objects.filter(user__username='user_3').exists(),
+        )
+
+    ##########################
+    #   AUDIENCE STREAMING   #
+    ##########################
+
+    def test_audience_is_paginated_by_primary_key(self):
+        drip = self.model_drip.drip
+        with self.assertNumQueries(4):
+            # the rules of the drip, then one query per page
+            chunks = list(drip.iter_audience_chunks(chunk_size=2))
+        self.assertEqual([2, 2, 1], [len(chunk) for chunk in chunks])
+        self.assertEqual(
+            list(self.User.objects.order_by('pk')),
+            [user for chunk in chunks for user in chunk],
+        )
+
+    def test_audience_of_exact_chunk_multiple(self):
+        drip = self.model_drip.drip
+        chunks = list(drip.iter_audience_chunks(chunk_size=5))
+        self.assertEqual([5], [len(chunk) for chunk in chunks])
+
+    def test_audience_pagination_with_uuid_keys(self):
+        ids = sorted(uuid.uuid4() for _ in range(5))
+        for pk in ids:
+            TestUserUUIDModel.objects.create(id=pk)
+        drip = UUIDDrip(drip_model=self.model_drip)
+        self.assertEqual(
+            ids, [user.pk for user in drip.iter_audience(chunk_size=2)],
+        )
+
+    @override_settings(DRIP_AUDIENCE_CHUNK_SIZE=2)
+    def test_send_streams_audience(self):
+        self.assertEqual(5, self.model_drip.drip.send())
+        self.assertEqual(5, SentDrip.objects.count())
+
+    ###############
+    #   PRUNING   #
+    ###############
+
+    def send_to_first_users(self, count):
+        for user in self.User.objects.order_by('pk')[:count]:
+            SentDrip.objects.create(
+                drip=self.model_drip,
+                user=user,
+                subject='s',
+                body='b',
+                date=timezone.now() - timedelta(days=1),
+            )
+
+    def pruned_ids(self):
+        drip = Drip.objects.get(id=self.model_drip.id).drip
+        drip.prune()
+        return set(drip.get_queryset().values_list('id', flat=True))
+
+    def test_prune_strategies_agree(self):
+        self.send_to_first_users(2)
+        with override_settings(DRIP_PRUNE_STRATEGY='in'):
+            pruned_with_in = self.pruned_ids()
+        with override_settings(DRIP_PRUNE_STRATEGY='exists'):
+            pruned_with_exists = self.pruned_ids()
+        self.assertEqual(3, len(pruned_with_exists))
+        self.assertEqual(pruned_with_in, pruned_with_exists)
+
+    def test_prune_uses_an_anti_join(self):
+        drip = self.model_drip.drip
+        drip.prune()
+        sql = str(drip.get_queryset().query)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn(' IN (', sql)
+
+    def test_prune_with_annotated_rules(self):
+        QuerySetRule.objects.create(
+            drip=self.model_drip,
+            field_name='groups__count',
+            lookup_type='exact',
+            field_value='0',
+        )
+        self.send_to_first_users(1)
+        self.assertEqual(4, len(self.pruned_ids()))
+
+    @override_settings(DRIP_PRUNE_STRATEGY='not-a-strategy')
+    def test_unknown_prune_strategy(self):
+        self.assertRaises(ImproperlyConfigured, self.model_drip.drip.prune)
+
+    ##########################
+    #   THREADED SENDING     #
+    ##########################
+
+    @override_settings(DRIP_SEND_WORKERS=3)
+    def test_threaded_send(self):
+        self.assertEqual(5, self.model_drip.drip.send())
+        self.assertEqual(5, SentDrip.objects.count())
+        self.assertEqual(
+            sorted('user_{i}@test.com'.format(i=i) for i in range(5)),
+            sorted(email.to[0] for email in mail.outbox),
+        )
+
+    def test_threaded_workers_own_their_connection(self):
+        threads = {}
+        lock = threading.Lock()
+
+        def track_thread(messages):
+            with lock:
+                connection = threads.setdefault(
+                    threading.current_thread(), EmailBackend(),
+                )
+            return connection.send_messages(messages)
+
+        drip = self.model_drip.drip
+        engine = ThreadedEngine(drip, DripMessage, workers=2, max_pending=1)
+        with patch.object(engine, 'get_connection') as get_connection:
+            get_connection.return_value.send_messages.side_effect = (
+                track_thread
+            )
+            self.assertEqual(5, engine.run())
+        self.assertLessEqual(len(threads), 2)
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual(5, SentDrip.objects.count())
+
+    def test_threaded_connections_are_closed(self):
+        drip = self.model_drip.drip
+        engine = ThreadedEngine(drip, DripMessage, workers=2)
+        with patch.object(
+            EmailBackend, 'close', autospec=True,
+        ) as close_connection:
+            engine.run()
+        self.assertGreaterEqual(close_connection.call_count, 1)
+        self.assertEqual([], engine.connections)
+
+    ################
+    #   PIPELINE   #
+    ################
+
+    @override_settings(DRIP_RENDER_WORKERS=2, DRIP_SEND_WORKERS=2)
+    def test_pipeline_send(self):
+        self.assertEqual(5, self.model_drip.drip.send())
+        self.assertEqual(5, SentDrip.objects.count())
+        self.assertEqual(
+            sorted('HELLO user_{i}'.format(i=i) for i in range(5)),
+            sorted(email.subject for email in mail.outbox),
+        )
+
+    def test_pipeline_stages_run_in_their_threads(self):
+        threads = {'render': set(), 'send': set()}
+        lock = threading.Lock()
+        drip = self.model_drip.drip
+        build_message = drip.build_message
+        send_messages = drip.send_messages
+
+        def track(stage, method):
+            def tracked(*args):
+                with lock:
+                    threads[stage].add(threading.current_thread())
+                return method(*args)
+            return tracked
+
+        engine = PipelineEngine(
+            drip, DripMessage, render_workers=2, send_workers=3, queue_size=1,
+        )
+        with patch.object(
+            drip, 'build_message', side_effect=track('render', build_message),
+        ), patch.object(
+            drip, 'send_messages', side_effect=track('send', send_messages),
+        ):
+            self.assertEqual(5, engine.run())
+        self.assertLessEqual(len(threads['render']), 2)
+        self.assertLessEqual(len(threads['send']), 3)
+        self.assertFalse(threads['render'] & threads['send'])
+        self.assertNotIn(
+            threading.current_thread(), threads['render'] | threads['send'],
+        )
+        self.assertEqual(5, SentDrip.objects.count())
+        self.assertEqual([], engine.connections)
+
+    def test_pipeline_skips_messages_that_fail(self):
+        class FailingMessage(DripMessage):
+            @property
+            def body(self):
+                if self.user.username == 'user_2':
+                    raise Exception('bad template')
+                return super(FailingMessage, self).body
+
+        connection = EmailBackend()
+        send_messages = connection.send_messages
+
+        def fail_for_user_3(messages):
+            if messages[0].to == ['user_3@test.com']:
+                raise Exception('mailbox unavailable')
+            return send_messages(messages)
+
+        engine = PipelineEngine(
+            self.model_drip.drip, FailingMessage, render_workers=1,
+            send_workers=1,
+        )
+        with patch.object(engine, 'get_connection', return_value=connection):
+            with patch.object(
+                connection, 'send_messages', side_effect=fail_for_user_3,
+            ):
+                self.assertEqual(3, engine.run())
+        self.assertEqual(
+            ['user_0', 'user_1', 'user_4'],
+            sorted(SentDrip.objects.values_list('user__username', flat=True)),
+        )
+
+    def test_pipeline_records_messages_sent_before_a_fetch_failure(self):
+        drip = self.model_drip.drip
+        users = list(self.User.objects.order_by('pk'))
+
+        def failing_audience():
+            yield users[0]
+            yield users[1]
+            raise Exception('database went away')
+
+        engine = PipelineEngine(
+            drip, DripMessage, render_workers=1, send_workers=1,
+        )
+        with patch.object(drip, 'iter_audience', side_effect=failing_audience):
+            self.assertRaises(Exception, engine.run)
+        self.assertEqual(2, SentDrip.objects.count())
+
+    ##########################
+    #   PROCESS RENDERING    #
+    ##########################
+
+    def test_render_chunk(self):
+        drip = self.model_drip.drip
+        users = list(self.User.objects.order_by('pk'))
+        rendered = render_chunk(
+            get_drip_state(drip), self.User, DripMessage,
+            [users[1].pk, users[3].pk],
+        )
+        body = 'KETTEHS ROCK!'
+        self.assertEqual(
+            {
+                users[1].pk: ('HELLO user_1', body, body),
+                users[3].pk: ('HELLO user_3', body, body),
+            },
+            rendered,
+        )
+
+    def test_render_chunk_keeps_the_drip_attributes(self):
+        drip = DripBase(
+            drip_model=self.model_drip,
+            name='Related',
+            select_related=['profile'],
+            prefetch_related=['groups'],
+            shard=(1, 2),
+        )
+        drip_state = pickle.loads(pickle.dumps(get_drip_state(drip)))
+        built = build_drip(drip_state)
+        self.assertEqual(['profile'], built.select_related)
+        self.assertEqual(['groups'], built.prefetch_related)
+        self.assertEqual((1, 2), built.shard)
+        with self.assertNumQueries(0):
+            # the drip model is sent along, and the drip reused
+            self.assertIs(built, build_drip(drip_state))
+
+    @skipIf(sys.version_info < (3, 7), 'needs Python 3.7')
+    def test_render_chunk_in_a_spawned_process(self):
+        engine = ProcessEngine(self.model_drip.drip, DripMessage, processes=1)
+        executor = engine.get_executor()
+        try:
+            # the process can't see the test database, but has to set
+            # Django up before loading the drip
+            future = executor.submit(
+                render_chunk, get_drip_state(engine.drip_base), self.User,
+                DripMessage, [],
+            )
+            self.assertEqual({}, future.result(timeout=60))
+        finally:
+            executor.shutdown()
+
+    def test_process_engine_only_sends_ids(self):
+        drip = self.model_drip.drip
+        executor = InlineExecutor()
+        engine = ProcessEngine(drip, DripMessage, processes=2, chunk_size=2)
+        with patch.object(
+            engine, 'get_executor', return_value=executor,
+        ), patch('drip.engines.render_chunk', wraps=render_chunk) as render:
+            self.assertEqual(5, engine.run())
+        self.assertEqual(3, render.call_count)
+        self.assertEqual(
+            [2, 2, 1], [len(call[-1]) for call in executor.calls],
+        )
+        self.assertTrue(all(
+            isinstance(pk, int) for call in executor.calls for pk in call[-1]
+        ))
+        self.assertEqual(5, SentDrip.objects.count())
+        self.assertEqual(
+            sorted('HELLO user_{i}'.format(i=i) for i in range(5)),
+            sorted(email.subject for email in mail.outbox),
+        )
+
+    def test_process_engine_does_not_render_in_the_parent(self):
+        drip = self.model_drip.drip
+        engine = ProcessEngine(drip, DripMessage, processes=1)
+        with patch.object(
+            engine, 'get_executor', return_value=InlineExecutor(),
+        ), patch(
+            'drip.engines.render_chunk', return_value={},
+        ) as render:
+            # every user failed to render in the worker
+            self.assertEqual(0, engine.run())
+        render.assert_called_once()
+        self.assertEqual([], mail.outbox)
+
+    def test_process_engine_skips_chunks_that_fail(self):
+        drip = self.model_drip.drip
+        calls = []
+
+        def fail_first_chunk(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise Exception('worker died')
+            return render_chunk(*args)
+
+        engine = ProcessEngine(drip, DripMessage, processes=2, chunk_size=2)
+        with patch.object(
+            engine, 'get_executor', return_value=InlineExecutor(),
+        ), patch('drip.engines.render_chunk', side_effect=fail_first_chunk):
+            self.assertEqual(3, engine.run())
+        self.assertEqual(3, SentDrip.objects.count())
+
+    @override_settings(DRIP_RENDER_PROCESSES=2)
+    def test_render_processes_need_python_3_7(self):
+        with patch('drip.engines.PROCESS_POOL_INITIALIZER', False):
+            self.assertRaises(ImproperlyConfigured, self.model_drip.drip.send)
+        self.assertEqual([], mail.outbox)
+
+    @override_settings(DRIP_RENDER_PROCESSES=2)
+    def test_send_renders_in_processes(self):
+        with patch(
+            'drip.engines.ProcessEngine.get_executor',
+            return_value=InlineExecutor(),
+        ):
+            self.assertEqual(5, self.model_drip.drip.send())
+        self.assertEqual(5, SentDrip.objects.count())
+
+    ######################
+    #   COLUMN PRUNING   #
+    ######################
+
+    def audience(self, model_drip=None):
+        drip = Drip.objects.get(id=(model_drip or self.model_drip).id).drip
+        return list(drip.iter_audience())
+
+    def test_audience_only_loads_columns_read(self):
+        users = self.audience()
+        self.assertEqual(
+            {'id', 'email', 'username'},
+            {
+                field.attname for field in self.User._meta.concrete_fields
+            } - users[0].get_deferred_fields(),
+        )
+        with self.assertNumQueries(0):
+            for user in users:
+                DripMessage(self.model_drip.drip, user).message
+
+    def test_audience_follows_one_to_one_relations(self):
+        self.model_drip.body_html_template = (
+            '{% if user.profile.credits %}'
+            '{{ user.profile.credits }} credits{% endif %}'
+        )
+        self.model_drip.save()
+        users = self.audience()
+        self.assertIn('first_name', users[0].get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.assertEqual(0, users[0].profile.credits)
+
+    def test_audience_columns_need_known_lookups(self):
+        for template in (
+            'Hi {{ user }}',
+            'Hi {{ user.get_full_name }}',
+            '{% for group in user.groups.all %}{{ group }}{% endfor %}',
+            '{% include "drip/timeline.html" %}',
+        ):
+            self.model_drip.body_html_template = template
+            self.model_drip.save()
+            self.assertEqual(
+                set(), self.audience()[0].get_deferred_fields(), template,
+            )
+
+    @override_settings(DRIP_AUDIENCE_FIELDS=['first_name', 'profile__credits'])
+    def test_audience_fields_setting(self):
+        user = self.audience()[0]
+        self.assertNotIn('first_name', user.get_deferred_fields())
+        self.assertIn('last_name', user.get_deferred_fields())
+        with self.assertNumQueries(0):
+            user.profile.credits
+
+    def test_custom_message_class_loads_every_column(self):
+        settings = {
+            'first_name': '{module}.FirstNameDripMessage'.format(
+                module=__name__,
+            ),
+        }
+        self.model_drip.message_class = 'first_name'
+        self.model_drip.save()
+        with override_settings(DRIP_MESSAGE_CLASSES=settings):
+            self.assertEqual(set(), self.audience()[0].get_deferred_fields())
+        with override_settings(
+            DRIP_MESSAGE_CLASSES=settings,
+            DRIP_AUDIENCE_FIELDS=['first_name'],
+        ):
+            deferred = self.audience()[0].get_deferred_fields()
+        self.assertNotIn('first_name', deferred)
+        self.assertIn('last_name', deferred)
+
+    @override_settings(DRIP_AUDIENCE_FIELDS='__all__')
+    def test_audience_fields_setting_loads_every_column(self):
+        self.assertEqual(set(), self.audience()[0].get_deferred_fields())
+
+    @override_settings(DRIP_AUDIENCE_CHUNK_SIZE=2)
+    def test_send_with_pruned_columns(self):
+        with patch.object(
+            self.User, 'refresh_from_db', autospec=True,
+        ) as refresh_from_db:
+            self.assertEqual(5, self.model_drip.drip.send())
+        refresh_from_db.assert_not_called()
+        self.assertEqual(
+            sorted('HELLO user_{i}'.format(i=i) for i in range(5)),
+            sorted(email.subject for email in mail.outbox),
+        )
+
+    ################
+    #   SHARDING   #
+    ################
+
+    def test_shards_partition_integer_keys(self):
+        shards = []
+        for index in range(3):
+            drip = self.model_drip.drip
+            drip.shard = (index, 3)
+            shards.append(
+                set(drip.get_queryset().values_list('pk', flat=True)),
+            )
+        self.assertEqual(
+            set(self.User.objects.values_list('pk', flat=True)),
+            set.union(*shards),
+        )
+        self.assertEqual(5, sum(len(shard) for shard in shards))
+
+    def test_shards_partition_uuid_keys(self):
+        ids = [uuid.uuid4() for _ in range(20)]
+        ids.append(uuid.UUID(int=0))
+        ids.append(uuid.UUID(int=2 ** 128 - 1))
+        for pk in ids:
+            TestUserUUIDModel.objects.create(id=pk)
+        shards = []
+        for index in range(4):
+            drip = UUIDDrip(drip_model=self.model_drip, shard=(index, 4))
+            shards.append(
+                set(drip.apply_shard(drip.get_queryset()).values_list(
+                    'pk', flat=True,
+                )),
+            )
+        self.assertEqual(set(ids), set.union(*shards))
+        self.assertEqual(len(ids), sum(len(shard) for shard in shards))
+
+    ###################
+    #   RUN HISTORY   #
+    ###################
+
+    def test_run_is_recorded(self):
+        self.model_drip.enabled = True
+        self.model_drip.save()
+        users = self.User.objects.filter(username__in=['user_0', 'user_1'])
+        for user in users:
+            SentDrip.objects.create(
+                drip=self.model_drip, user=user, subject='s', body='b',
+            )
+        connection = EmailBackend()
+        send_messages = connection.send_messages
+
+        def fail_for_user_3(messages):
+            if messages[0].to == ['user_3@test.com']:
+                raise Exception('mailbox unavailable')
+            return send_messages(messages)
+
+        drip = self.model_drip.drip
+        with patch('drip.drips.get_connection', return_value=connection):
+            with patch.object(
+                connection, 'send_messages', side_effect=fail_for_user_3,
+            ):
+                self.assertEqual(2, drip.run())
+        run = DripRun.objects.get()
+        self.assertEqual(self.model_drip, run.drip)
+        self.assertEqual((5, 2, 2, 1), (
+            run.audience, run.pruned, run.sent, run.failures,
+        ))
+        self.assertLessEqual(run.started_at, run.finished_at)
+        for phase in ('query', 'prune', 'render', 'send', 'persist'):
+            self.assertGreater(getattr(run, phase + '_time'), 0)
+        self.assertEqual(drip.stats.sent, run.sent)
+
+    def test_render_failures_are_counted(self):
+        class FailingMessage(DripMessage):
+            @property
+            def body(self):
+                if self.user.username == 'user_2':
+                    raise Exception('bad template')
+                return super(FailingMessage, self).body
+
+        drip = self.model_drip.drip
+        engine = PipelineEngine(
+            drip, FailingMessage, render_workers=2, send_workers=2,
+        )
+        self.assertEqual(4, engine.run())
+        self.assertEqual((4, 1), (drip.stats.sent, drip.stats.failures))
+        self.assertGreater(drip.stats.timings['render'], 0)
+
+    def test_failed_run_is_recorded(self):
+        self.model_drip.enabled = True
+        self.model_drip.save()
+        drip = self.model_drip.drip
+        with patch.object(drip, 'send', side_effect=Exception('boom')):
+            self.assertRaises(Exception, drip.run)
+        run = DripRun.objects.get()
+        self.assertEqual(5, run.audience)
+        self.assertEqual(0, run.sent)
+        self.assertIsNotNone(run.finished_at)
+
+    @override_settings(DRIP_RECORD_RUNS=False)
+    def test_runs_are_not_recorded(self):
+        self.model_drip.enabled = True
+        self.model_drip.save()
+        drip = self.model_drip.drip
+        with self.assertNumQueries(2):
+            # the rules, then the audience, which gets no counts
+            list(drip.iter_audience())
+        self.assertEqual(5, drip.run())
+        self.assertFalse(DripRun.objects.exists())
+        self.assertIsNone(drip.stats.audience)
+        self.assertEqual(5, drip.stats.sent)
@@ -0,0 +1,142 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from drip.drips import DripMessage
+from drip.tests.mixins import AudienceMixin
+from drip.tracing import (
+    NULL_SPAN,
+    JSONLinesExporter,
+    SpanStack,
+    exporters,
+    get_exporter,
+    span,
+)
+
+
+class TracingTestCase(AudienceMixin, TestCase):
+
+    def setUp(self):
+        exporters.clear()
+        self.addCleanup(exporters.clear)
+        super(TracingTestCase, self).setUp()
+
+    def test_disabled(self):
+        self.assertIs(NULL_SPAN, span('drip.run', drip_id=1))
+        self.assertEqual(5, self.model_drip.drip.run())
+        self.assertEqual({}, exporters)
+
+    @override_settings(
+        DRIP_TRACING_EXPORTER='drip.tracing.InMemoryExporter',
+        DRIP_AUDIENCE_CHUNK_SIZE=2,
+    )
+    def test_run_spans(self):
+        self.check_run_spans()
+
+    @override_settings(
+        DRIP_TRACING_EXPORTER='drip.tracing.InMemoryExporter',
+        DRIP_AUDIENCE_CHUNK_SIZE=2,
+    )
+    def test_run_spans_without_contextvars(self):
+        with patch('drip.tracing.current_span', SpanStack()):
+            self.check_run_spans()
+
+    def check_run_spans(self):
+        self.assertEqual(5, self.model_drip.drip.run())
+        exporter = get_exporter()
+        spans = {}
+        for exported in exporter.get_spans():
+            spans.setdefault(exported.name, []).append(exported)
+        self.assertEqual({
+            'drip.run': 1,
+            'drip.prune': 1,
+            'drip.send': 1,
+            'drip.query': 3,
+            'drip.render': 5,
+            'drip.send_messages': 1,
+            'drip.persist': 1,
+        }, {name: len(named) for name, named in spans.items()})
+
+        run, = spans['drip.run']
+        send, = spans['drip.send']
+        self.assertIsNone(run.parent_id)
+        self.assertEqual(
+            {'drip_id': self.model_drip.id, 'user_count': 5}, run.attributes,
+        )
+        self.assertEqual(run.span_id, spans['drip.prune'][0].parent_id)
+        self.assertEqual(run.span_id, send.parent_id)
+        self.assertEqual(
+            [(0, 2), (1, 2), (2, 1)],
+            [
+                (query.attributes['batch_index'],
+                 query.attributes['user_count'])
+                for query in spans['drip.query']
+            ],
+        )
+        for child in spans['drip.query'] + spans['drip.render']:
+            self.assertEqual(send.span_id, child.parent_id)
+            self.assertEqual(self.model_drip.id, child.attributes['drip_id'])
+        self.assertEqual(
+            set(self.User.objects.values_list('pk', flat=True)),
+            {render.attributes['user_id'] for render in spans['drip.render']},
+        )
+        self.assertEqual(
+            {run.trace_id}, {exported.trace_id for exported in exporter.spans},
+        )
+        for exported in exporter.spans:
+            self.assertGreaterEqual(run.duration, exported.duration)
+
+    def test_span_stack_of_interleaved_spans(self):
+        stack = SpanStack()
+        first = stack.set('first')
+        second = stack.set('second')
+        # e.g. two asyncio tasks, the first ending before the second
+        stack.reset(first)
+        self.assertEqual('second', stack.get())
+        stack.reset(second)
+        self.assertIsNone(stack.get())
+
+    @override_settings(
+        DRIP_TRACING_EXPORTER='drip.tracing.InMemoryExporter',
+    )
+    def test_failed_span(self):
+        class FailingMessage(DripMessage):
+            @property
+            def body(self):
+                raise ValueError('bad template')
+
+        drip = self.model_drip.drip
+        user = self.User.objects.first()
+        self.assertIsNone(drip.build_message(FailingMessage, user))
+        render, = get_exporter().get_spans('drip.render')
+        self.assertEqual('ValueError: bad template', render.error)
+
+    def test_json_lines_exporter(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'spans-{pid}.jsonl')
+        exporter = JSONLinesExporter(path)
+        with override_settings(
+            DRIP_TRACING_EXPORTER='drip.tracing.JSONLinesExporter',
+        ):
+            exporters['drip.tracing.JSONLinesExporter'] = exporter
+            with span('outer', drip_id=1) as outer:
+                with span('inner', batch_index=0) as inner:
+                    inner.set_attribute('user_count', 3)
+        exporter.close()
+        exported = path.format(pid=os.getpid())
+        with open(exported) as lines:
+            spans = [json.loads(line) for line in lines]
+        os.remove(exported)
+        os.rmdir(directory)
+
+        self.assertEqual(['inner', 'outer'], [s['name'] for s in spans])
+        self.assertEqual(
+            {'batch_index': 0, 'user_count': 3}, spans[0]['attributes'],
+        )
+        self.assertEqual(outer.span_id, spans[0]['parent_id'])
+        self.assertEqual(outer.trace_id, spans[0]['trace_id'])
+        self.assertIsNone(spans[1]['parent_id'])
+        self.assertIsNone(spans[1]['error'])
@@ -0,0 +1,266 @@
+import json
+import os
+import threading
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # Python < 3.7
+    ContextVar = None
+
+
+def tracing_exporter() -> str:
+    """Dotted path of the exporter spans of drip runs are sent to.
+
+    :return: the ``DRIP_TRACING_EXPORTER`` setting, defaults to None,
+        which disables tracing
+    :rtype: str
+    """
+    return getattr(settings, 'DRIP_TRACING_EXPORTER', None)
+
+
+def tracing_file() -> str:
+    """File the JSON lines exporter appends spans to.
+
+    A ``{pid}`` in the path is replaced by the id of the process.
+
+    :return: the ``DRIP_TRACING_FILE`` setting, defaults to None
+    :rtype: str
+    """
+    return getattr(settings, 'DRIP_TRACING_FILE', None)
+
+
+def new_id(size: int = 8) -> str:
+    return os.urandom(size).hex()
+
+
+class SpanStack(object):
+    """
+    The spans open in each thread, used in place of a ``ContextVar``
+    where ``contextvars`` is missing.
+
+    asyncio tasks of a thread share its stack: a span opened by a task
+    may get a span of another task as its parent, but a span always
+    leaves the stack when it ends.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def get_stack(self) -> list:
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def get(self):
+        stack = self.get_stack()
+        return stack[-1] if stack else None
+
+    def set(self, span):
+        self.get_stack().append(span)
+        return span
+
+    def reset(self, token) -> None:
+        stack = self.get_stack()
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index] is token:
+                del stack[index]
+                return
+
+
+#: the span the code running is in
+if ContextVar is None:
+    current_span = SpanStack()
+else:
+    current_span = ContextVar('drip_current_span', default=None)
+
+
+class Span(object):
+    """
+    A timed operation of a drip run, exported once it ends.
+
+    Spans opened while another one is open in the same thread, or
+    asyncio task, are its children and share its trace. Threads started
+    by an engine don't inherit the open span, their spans start new
+    traces.
+    """
+
+    def __init__(self, name: str, exporter, attributes: dict):
+        self.name = name
+        self.exporter = exporter
+        self.attributes = attributes
+        self.trace_id = None
+        self.span_id = new_id()
+        self.parent_id = None
+        self.start = None
+        self.duration = None
+        self.error = None
+
+    def set_attribute(self, name: str, value) -> None:
+        self.attributes[name] = value
+
+    def __enter__(self):
+        parent = current_span.get()
+        if parent is None:
+            self.trace_id = new_id(16)
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+        self.token = current_span.set(self)
+        self.start = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.started
+        current_span.reset(self.token)
+        if exc_value is not None:
+            self.error = '{type}: {error}'.format(
+                type=exc_type.__name__, error=exc_value,
+            )
+        self.exporter.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration': self.duration,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+class NullSpan(object):
+    """What ``span`` returns when tracing is disabled, does nothing."""
+
+    def set_attribute(self, name: str, value) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class SpanExporter(object):
+    """Receives every span once it ends."""
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps the spans, for tests."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = []
+
+    def export(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.spans = []
+
+    def get_spans(self, name: str = None) -> list:
+        return [
+            span for span in self.spans
+            if name is None or span.name == name
+        ]
+
+
+class JSONLinesExporter(SpanExporter):
+    """
+    Appends every span, as a line of JSON, to ``DRIP_TRACING_FILE``.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def get_file(self):
+        if self.file is None:
+            path = self.path or tracing_file()
+            self.file = open(path.format(pid=os.getpid()), 'a')
+        return self.file
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self.lock:
+            textfile = self.get_file()
+            textfile.write(line + '\n')
+            textfile.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+#: an exporter per dotted path, created once per process
+exporters = {}
+exporters_lock = threading.Lock()
+#: ``(exporter,)`` once the setting has been read, see ``span``
+configured_exporter = None
+
+
+def get_exporter():
+    """The exporter of ``DRIP_TRACING_EXPORTER``, or None."""
+    path = tracing_exporter()
+    if not path:
+        return None
+    exporter = exporters.get(path)
+    if exporter is None:
+        with exporters_lock:
+            exporter = exporters.get(path)
+            if exporter is None:
+                mod_name, klass_name = path.rsplit('.', 1)
+                klass = getattr(import_module(mod_name), klass_name)
+                exporter = klass()
+                exporters[path] = exporter
+    return exporter
+
+
+def reset_exporter(setting: str = None, **kwargs) -> None:
+    global configured_exporter
+    if setting in (None, 'DRIP_TRACING_EXPORTER'):
+        configured_exporter = None
+
+
+setting_changed.connect(reset_exporter)
+
+
+def span(name: str, **attributes):
+    """Open a span, used as a context manager::
+
+        with span('drip.render', drip_id=drip.id) as current:
+            ...
+            current.set_attribute('user_count', count)
+
+    When tracing is disabled this returns a shared span that does
+    nothing. The exporter is only looked up once, and again when the
+    setting is changed, e.g. by ``override_settings``.
+    """
+    global configured_exporter
+    if configured_exporter is None:
+        configured_exporter = (get_exporter(),)
+    exporter = configured_exporter[0]
+    if exporter is None:
+        return NULL_SPAN
+    return Span(name, exporter, attributes)
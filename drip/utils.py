@@ -1,5 +1,8 @@
+import hashlib
+import json
 import sys
 
+from django.apps import apps
 from django.db import models
 from django.db.models import ForeignKey, OneToOneField, ManyToManyField
 from django.db.models.fields.related import ForeignObjectRel as RelatedObject
@@ -114,9 +117,9 @@ def get_out_fields(Model, parent_field, model_stack, excludes, fields):
 def get_fields(
     Model,
     parent_field="",
-    model_stack=[],
+    model_stack=None,
     stack_limit=2,
-    excludes=['permissions', 'comment', 'content_type']
+    excludes=('permissions', 'comment', 'content_type')
 ):
     """
     Given a Model, return a list of lists of strings with important stuff:
@@ -136,6 +139,7 @@ def get_fields(
     fields = Model._meta.fields + \
         Model._meta.many_to_many + \
         Model._meta.get_fields()
+    model_stack = list(model_stack or [])
     model_stack.append(Model)
 
     # do a variety of checks to ensure recursion isnt being redundant
@@ -148,6 +152,77 @@ def get_fields(
     return get_out_fields(Model, parent_field, model_stack, excludes, fields)
 
 
+class FieldGraph(object):
+    """
+    The fields reachable from a model, as returned by ``get_fields``,
+    indexed by their full ``a__b__c`` path.
+    """
+
+    def __init__(self, Model):
+        self.Model = Model
+        self.fields = get_fields(Model)
+        self.index = {}
+        for field in self.fields:
+            self.index.setdefault(field[0], field)
+        self._simple_fields = None
+        self._field_data = None
+
+    def get(self, full_field: str):
+        return self.index.get(full_field)
+
+    @property
+    def simple_fields(self) -> list:
+        if self._simple_fields is None:
+            self._simple_fields = build_simple_fields(self.fields)
+        return self._simple_fields
+
+    @property
+    def field_data(self) -> tuple:
+        """The simple fields serialized to JSON, with an ETag built from
+        a hash of that JSON so every process serves the same one.
+        """
+        if self._field_data is None:
+            content = json.dumps(self.simple_fields)
+            etag = '"{digest}"'.format(
+                digest=hashlib.sha1(content.encode('utf-8')).hexdigest(),
+            )
+            self._field_data = (content, etag)
+        return self._field_data
+
+
+class FieldGraphCache(object):
+    """
+    Field graphs built once per model.
+
+    Related fields are only complete once every app is loaded, so the
+    graphs are dropped whenever the readiness of the app registry
+    changes.
+    """
+
+    def __init__(self):
+        self.graphs = {}
+        self.apps_ready = apps.ready
+
+    def get(self, Model) -> FieldGraph:
+        if self.apps_ready != apps.ready:
+            self.clear()
+        graph = self.graphs.get(Model)
+        if graph is None:
+            graph = self.graphs[Model] = FieldGraph(Model)
+        return graph
+
+    def clear(self) -> None:
+        self.graphs = {}
+        self.apps_ready = apps.ready
+
+
+field_graph_cache = FieldGraphCache()
+
+
+def get_field_graph(Model) -> FieldGraph:
+    return field_graph_cache.get(Model)
+
+
 def give_model_field(full_field: str, Model: models.Model) -> tuple:
     """Given a field_name and Model:
 
@@ -164,11 +239,10 @@ def give_model_field(full_field: str, Model: models.Model) -> tuple:
     :rtype: tuple
     """
 
-    field_data = get_fields(Model, '', [])
-
-    for full_key, name, _Model, _ModelField in field_data:
-        if full_key == full_field:
-            return full_key, name, _Model, _ModelField
+    field = get_field_graph(Model).get(full_field)
+    if field is not None:
+        full_key, name, _Model, _ModelField = field
+        return full_key, name, _Model, _ModelField
 
     raise Exception(
         'Field key `{field}` not found on `{model}`.'.format(
@@ -178,19 +252,28 @@ def give_model_field(full_field: str, Model: models.Model) -> tuple:
     )
 
 
-def get_simple_fields(Model, **kwargs):
+def build_simple_fields(fields: list) -> list:
     ret_list = []
-    for f in get_fields(Model, **kwargs):
-        if '__' in f[0]:
+    seen = set()
+    for f in fields:
+        full_field = f[0]
+        if '__' in full_field:
             # Add __user__ to the fields in related models
-            parts = f[0].split('__')
-            f[0] = parts[0] + '__user__' + parts[1]
-        if f[0] not in [x[0] for x in ret_list]:
+            parts = full_field.split('__')
+            full_field = parts[0] + '__user__' + parts[1]
+        if full_field not in seen:
             # Add field if not already in list
-            ret_list.append([f[0], f[3].__name__])
+            seen.add(full_field)
+            ret_list.append([full_field, f[3].__name__])
     return ret_list
 
 
+def get_simple_fields(Model, **kwargs):
+    if kwargs:
+        return build_simple_fields(get_fields(Model, **kwargs))
+    return [list(field) for field in get_field_graph(Model).simple_fields]
+
+
 def get_user_model():
     # handle 1.7 and back
     try:
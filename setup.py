@@ -21,6 +21,7 @@ author = 'Kalil de Lima'
 author_email = 'kalil@rootstrap.com'
 license = 'MIT'
 install_requires = ['Django>=2.2', 'apscheduler']
+extras_require = {'async': ['aiosmtplib', 'asgiref']}
 keywords = 'django drip email user query'
 
 
@@ -80,6 +81,7 @@ setup(
     packages=get_packages(package),
     package_data=get_package_data(package),
     install_requires=install_requires,
+    extras_require=extras_require,
     long_description=long_description,
     long_description_content_type='text/markdown',
     classifiers=[